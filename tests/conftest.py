@@ -1,4 +1,6 @@
 import os
+import shutil
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
@@ -28,6 +30,7 @@ from django.utils.version import get_version
 assert get_version() < '3.0.0', 'Пожалуйста, используйте версию Django < 3.0.0'
 
 from yatube.settings import INSTALLED_APPS
+from core.runner import use_temp_caches
 
 assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts']), (
     'Пожалуйста зарегистрируйте приложение в `settings.INSTALLED_APPS`'
@@ -37,3 +40,15 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+CACHE_DIR = tempfile.mkdtemp()
+
+
+def pytest_configure(config):
+    # Сбор тестов уже обращается к кэшу, поэтому подменяем его здесь,
+    # а не в фикстуре.
+    use_temp_caches(CACHE_DIR)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
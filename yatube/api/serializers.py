@@ -0,0 +1,39 @@
+def post_data(post):
+    data = {
+        'id': post.id,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': None,
+        'likes_count': post.likes_count,
+        'comments_count': post.comments_count,
+    }
+    if post.image:
+        data['image'] = {
+            'url': post.image.url,
+            'width': post.image_width,
+            'height': post.image_height,
+        }
+    if hasattr(post, 'is_liked'):
+        data['liked'] = post.is_liked
+    return data
+
+
+def comment_data(comment):
+    return {
+        'id': comment.id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def page_data(request, page):
+    def link(cursor):
+        return f'{request.path}?cursor={cursor}' if cursor else None
+    return {
+        'results': [post_data(post) for post in page],
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+    }
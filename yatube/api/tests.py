@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_pages(self):
+        """Ленты отдаются страницами по курсору"""
+        for url in (
+            reverse('api:index'),
+            reverse('api:group_posts', args=(self.group.slug,)),
+            reverse('api:profile', args=(self.author.username,)),
+        ):
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [self.posts[2].id, self.posts[1].id],
+                )
+                self.assertEqual(data['results'][0]['group'], 'group')
+                data = self.client.get(data['next']).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [self.posts[0].id],
+                )
+                self.assertIsNone(data['next'])
+        self.assertEqual(
+            self.client.get(reverse('api:follow_index')).status_code, 401)
+
+    def test_conditional_get(self):
+        """Неизменившаяся страница отдаётся ответом 304"""
+        url = reverse('api:index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        post = Post.objects.get(pk=self.posts[2].pk)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['text'], 'Новый текст')
+
+    def test_not_modified_skips_posts(self):
+        """Для ответа 304 посты целиком не загружаются"""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.client.force_login(reader)
+        for url in (reverse('api:index'), reverse('api:follow_index')):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(len(response.json()['results']), 2)
+                etag = response['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(any(
+                    '"posts_post"."text"' in query['sql']
+                    for query in queries.captured_queries))
+
+    def test_post_detail_comments(self):
+        """Новый комментарий меняет ETag поста"""
+        url = reverse('api:post_detail', args=(self.posts[0].id,))
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.posts[0], author=self.author, text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий')
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from core import surrogate
+from core.replicas import replica_reads
+from core.surrogate import surrogate_key
+from posts.cards import card_surrogate_keys
+from posts.conditional import (FEEDS_KEY, not_modified, set_validators,
+                               validators)
+from posts.feeds import load_page, posts_feed, posts_stubs
+from posts.models import Group, User
+from posts.timeline import following_feed
+from posts.utils import KeysetPaginator
+
+from .serializers import comment_data, page_data, post_data
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def conditional_json(request, data, keys, parts=(), since=()):
+    """
+    Отвечает 304 по If-None-Match/If-Modified-Since, не собирая тело;
+    data вызывается, только если ответ действительно нужен.
+    """
+    etag, last_modified = validators(keys, parts, since)
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        response = JsonResponse(data(), json_dumps_params=JSON_PARAMS)
+    surrogate.add_header(response, keys)
+    return set_validators(response, etag, last_modified)
+
+
+def feed_response(request, post_list, since=(), **options):
+    """
+    Страница ленты по лёгким строкам posts_stubs: для ответа 304 хватает
+    их, посты целиком загружаются, только если нужно тело.
+    """
+    paginator = KeysetPaginator(post_list, settings.API_PAGE_SIZE, **options)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return conditional_json(
+        request, lambda: page_data(request, load_page(page, request.user)),
+        [key for post in page for key in card_surrogate_keys(post)],
+        parts=(
+            [(post.id, getattr(post, 'is_liked', None)) for post in page],
+            page.next_cursor,
+            page.previous_cursor,
+        ),
+        since=(FEEDS_KEY,) + tuple(since),
+    )
+
+
+@replica_reads
+def index(request):
+    return feed_response(request, posts_stubs(request.user))
+
+
+@replica_reads
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, posts_stubs(request.user, group=group))
+
+
+@replica_reads
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, posts_stubs(request.user, author=author))
+
+
+@replica_reads
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Authentication required'}, status=401)
+    post_list, options = following_feed(request.user, stubs=True)
+    return feed_response(
+        request, post_list,
+        since=(surrogate_key('follows', request.user.id),), **options)
+
+
+def post_detail(request, post_id):
+    post = get_object_or_404(posts_feed(request.user), id=post_id)
+    comments = list(
+        post.comments.select_related('author').order_by('created', 'id'))
+
+    def data():
+        result = post_data(post)
+        result['comments'] = [
+            comment_data(comment) for comment in comments]
+        return result
+    return conditional_json(
+        request, data,
+        card_surrogate_keys(post) + [
+            surrogate_key('user', comment.author_id) for comment in comments],
+        parts=(
+            getattr(post, 'is_liked', None),
+            [comment.id for comment in comments],
+        ),
+    )
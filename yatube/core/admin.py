@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'queue',
+        'status',
+        'attempts',
+        'run_at',
+    )
+    list_filter = ('status', 'queue')
+    search_fields = ('name',)
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,264 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'PRAGMA journal_mode = WAL',
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL,'
+    ' accessed REAL NOT NULL, size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    # Число записей и их суммарный размер поддерживают триггеры, чтобы
+    # проверка лимитов при записи была чтением одной строки.
+    'CREATE TABLE IF NOT EXISTS totals ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER, bytes INTEGER)',
+    'INSERT OR IGNORE INTO totals VALUES (0, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN'
+    ' UPDATE totals SET entries = entries + 1, bytes = bytes + new.size;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN'
+    ' UPDATE totals SET entries = entries - 1, bytes = bytes - old.size;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache'
+    ' BEGIN UPDATE totals SET bytes = bytes - old.size + new.size; END',
+)
+
+
+# Не больше параметров в одном запросе, чем позволяют старые сборки SQLite.
+CHUNK_SIZE = 500
+
+
+def chunks(items):
+    return [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+
+
+def placeholders(items):
+    return ', '.join('?' * len(items))
+
+
+def dump(value):
+    # Целые числа хранятся как есть, чтобы incr шёл одним UPDATE.
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def load(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кэш в файле SQLite в режиме WAL, общий для всех процессов на машине:
+    воркеры сайта и очереди задач видят одни и те же фрагменты, версии
+    и счётчики. Читатели не блокируют писателя и друг друга.
+
+    LOCATION — путь к файлу. Кроме MAX_ENTRIES и CULL_FREQUENCY
+    понимает OPTIONS['MAX_SIZE'] — предел суммарного размера значений в
+    байтах. При превышении сначала удаляются просроченные записи, затем
+    давно не читанные (LRU). Время чтения обновляется не чаще раза в
+    ACCESS_RESOLUTION секунд, чтобы чтение почти всегда обходилось без
+    записи.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = options.get('MAX_SIZE')
+        self._access_resolution = options.get('ACCESS_RESOLUTION', 60)
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение своё у каждого потока; после fork открывается заново.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=self._busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA synchronous = NORMAL')
+            # Иначе INSERT OR REPLACE не вызывает триггер удаления.
+            connection.execute('PRAGMA recursive_triggers = ON')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def _write(self, func):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(connection, time.time())
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _cull(self, connection, now):
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM totals').fetchone()
+        if not self._over(entries, size):
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (now,))
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM totals').fetchone()
+        while self._over(entries, size):
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache')
+                return
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(1, entries // self._cull_frequency),),
+            )
+            entries, size = connection.execute(
+                'SELECT entries, bytes FROM totals').fetchone()
+
+    def _over(self, entries, size):
+        return entries > self._max_entries or (
+            self._max_size is not None and size > self._max_size)
+
+    def _store(self, connection, now, key, value, timeout, replace=True):
+        data, size = dump(value)
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+        if not replace:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now))
+        cursor = connection.execute(
+            f'{verb} INTO cache (key, value, expires, accessed, size) '
+            f'VALUES (?, ?, ?, ?, ?)',
+            (key, data, self.get_backend_timeout(timeout), now, size),
+        )
+        return cursor.rowcount > 0
+
+    def _read(self, keys):
+        now = time.time()
+        rows = []
+        for chunk in chunks(keys):
+            rows += self._connection().execute(
+                f'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({placeholders(chunk)}) '
+                f'AND (expires IS NULL OR expires > ?)',
+                (*chunk, now),
+            ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if now - accessed > self._access_resolution]
+
+        def touch(connection, now):
+            for chunk in chunks(stale):
+                connection.execute(
+                    f'UPDATE cache SET accessed = ? '
+                    f'WHERE key IN ({placeholders(chunk)})',
+                    (now, *chunk),
+                )
+        if stale:
+            self._write(touch)
+        return {key: load(value) for key, value, _ in rows}
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+
+        def add(connection, now):
+            added = self._store(connection, now, key, value, timeout, False)
+            if added:
+                self._cull(connection, now)
+            return added
+        return self._write(add)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._read(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {self._key(key, version): value for key, value in data.items()}
+
+        def set_many(connection, now):
+            for key, value in data.items():
+                self._store(connection, now, key, value, timeout)
+            self._cull(connection, now)
+        if data:
+            self._write(set_many)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._write(lambda connection, now: connection.execute(
+            'UPDATE cache SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        ).rowcount > 0)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+
+        def delete_many(connection, now):
+            for chunk in chunks(keys):
+                connection.execute(
+                    f'DELETE FROM cache WHERE key IN ({placeholders(chunk)})',
+                    chunk,
+                )
+        if keys:
+            self._write(delete_many)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно: сложение идёт в самом UPDATE, без чтения значения."""
+        key = self._key(key, version)
+
+        def incr(connection, now):
+            updated = connection.execute(
+                "UPDATE cache SET value = value + ?, accessed = ? "
+                "WHERE key = ? AND typeof(value) = 'integer' "
+                "AND (expires IS NULL OR expires > ?)",
+                (delta, now, key, now),
+            ).rowcount
+            if not updated:
+                raise ValueError(f"Key '{key}' not found or not an integer")
+            return connection.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)).fetchone()[0]
+        return self._write(incr)
+
+    def clear(self):
+        self._write(
+            lambda connection, now: connection.execute('DELETE FROM cache'))
+
+    def close(self, **kwargs):
+        # Соединения живут всё время процесса: открывать файл на каждый
+        # запрос дороже, чем держать его открытым.
+        pass
@@ -0,0 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+
+from posts.notifications import unread_count
+
+
+def notifications(request):
+    """Число непрочитанных уведомлений; запрос к базе только при выводе."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'unread_notifications': 0}
+    return {
+        'unread_notifications': SimpleLazyObject(lambda: unread_count(user))
+    }
@@ -0,0 +1,166 @@
+import base64
+import email
+import json
+import smtplib
+import threading
+import time
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.core.mail import (EmailMessage, EmailMultiAlternatives,
+                              get_connection)
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .tasks import claim, finish, format_error, task
+
+
+def dump_message(message):
+    """EmailMessage в словарь для аргументов задачи (JSON)."""
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'content_subtype': message.content_subtype,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': [
+            dump_attachment(attachment) for attachment in message.attachments
+        ],
+    }
+
+
+def dump_attachment(attachment):
+    # Готовая MIME-часть (например, картинка с Content-ID) сохраняется
+    # целиком, с заголовками; остальное — кортеж (имя, данные, тип).
+    if isinstance(attachment, MIMEBase):
+        return {'mime': base64.b64encode(attachment.as_bytes()).decode()}
+    filename, content, mimetype = attachment
+    if isinstance(content, str):
+        content = content.encode()
+    return (filename, base64.b64encode(content).decode(), mimetype)
+
+
+def load_attachment(data):
+    if isinstance(data, list):
+        filename, content, mimetype = data
+        return filename, base64.b64decode(content), mimetype
+    parsed = email.message_from_bytes(base64.b64decode(data['mime']))
+    part = MIMEBase(parsed.get_content_maintype(),
+                    parsed.get_content_subtype())
+    for header in set(part.keys()):
+        del part[header]
+    for header, value in parsed.items():
+        part[header] = value
+    part.set_payload(parsed.get_payload())
+    return part
+
+
+def load_message(data):
+    message = EmailMultiAlternatives(
+        subject=data['subject'],
+        body=data['body'],
+        from_email=data['from_email'],
+        to=data['to'],
+        cc=data['cc'],
+        bcc=data['bcc'],
+        reply_to=data['reply_to'],
+        headers=data['headers'],
+        alternatives=[tuple(item) for item in data['alternatives']],
+    )
+    message.content_subtype = data['content_subtype']
+    for attachment in data['attachments']:
+        attachment = load_attachment(attachment)
+        if isinstance(attachment, MIMEBase):
+            message.attach(attachment)
+        else:
+            message.attach(*attachment)
+    return message
+
+
+class PersistentConnection:
+    """
+    Соединение для доставки писем, живущее между задачами в процессе
+    воркера: TLS-рукопожатие с SMTP-сервером происходит один раз, а не
+    на каждое письмо. Простоявшее дольше EMAIL_CONNECTION_IDLE
+    соединение закрывается, оборванное сервером — открывается заново.
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._backend = None
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except (OSError, smtplib.SMTPException):
+                pass
+            self._connection = None
+
+    def _open(self):
+        idle = time.monotonic() - self._used > settings.EMAIL_CONNECTION_IDLE
+        if idle or self._backend != settings.EMAIL_DELIVERY_BACKEND:
+            self._close()
+        if self._connection is None:
+            self._backend = settings.EMAIL_DELIVERY_BACKEND
+            self._connection = get_connection(
+                self._backend, fail_silently=False)
+            self._connection.open()
+        return self._connection
+
+    def send(self, messages):
+        with self._lock:
+            try:
+                sent = self._open().send_messages(messages)
+            except smtplib.SMTPServerDisconnected:
+                self._close()
+                sent = self._open().send_messages(messages)
+            except Exception:
+                self._close()
+                raise
+            self._used = time.monotonic()
+            return sent
+
+
+delivery = PersistentConnection()
+
+
+@task(queue='mail')
+def deliver(message):
+    """
+    Отправляет письмо, а с ним до EMAIL_BATCH_SIZE других ждущих в
+    очереди писем через то же соединение. Каждое письмо — своя задача:
+    упавшее повторяется отдельно, а доставленные не уходят второй раз.
+    """
+    delivery.send([load_message(message)])
+    for queued in claim(settings.EMAIL_BATCH_SIZE - 1, ['mail']):
+        try:
+            [data] = json.loads(queued.args)
+            delivery.send([load_message(data)])
+        except Exception as error:
+            finish(queued, format_error(error))
+        else:
+            finish(queued)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Бэкенд почты, который ничего не отправляет сам: каждое письмо
+    ставится в очередь своей задачей, а доставляет их пачками воркер
+    через EMAIL_DELIVERY_BACKEND. Запрос ждёт только записи в базу.
+    """
+
+    def send_messages(self, email_messages):
+        messages = [
+            dump_message(message) for message in email_messages
+            if isinstance(message, EmailMessage) and message.recipients()
+        ]
+        for message in messages:
+            deliver.delay(message)
+        return len(messages)
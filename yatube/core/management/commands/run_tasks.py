@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.tasks import Worker, prune, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.TASK_WORKERS,
+            help='Сколько задач выполнять одновременно; 0 — в этом процессе',
+        )
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help='Брать задачи только из этой очереди (можно несколько)',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить созревшие задачи и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] > 0:
+            Worker(options['workers'], options['queues']).run(options['once'])
+        elif options['once']:
+            done = run_pending(options['queues'])
+            self.stdout.write(f'Выполнено задач: {done}')
+        else:
+            pruned = 0
+            while True:
+                if time.monotonic() - pruned >= settings.TASK_PRUNE_INTERVAL:
+                    prune()
+                    pruned = time.monotonic()
+                if not run_pending(options['queues']):
+                    time.sleep(settings.TASK_POLL_INTERVAL)
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.replicas import copy_database
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную SQLite-базу в файлы реплик'
+
+    def handle(self, *args, **options):
+        for alias in settings.REPLICA_DATABASES:
+            copy_database(DEFAULT_DB_ALIAS, alias)
+            name = connections[alias].settings_dict['NAME']
+            self.stdout.write(f'{alias}: {name}')
@@ -0,0 +1,48 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    QUEUED = 'q'
+    RUNNING = 'r'
+    DONE = 'd'
+    FAILED = 'f'
+    STATUSES = (
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    )
+    name = models.CharField(max_length=200)
+    args = models.TextField(default='[]')
+    kwargs = models.TextField(default='{}')
+    queue = models.CharField(max_length=50, default='default')
+    status = models.CharField(
+        max_length=1, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    # Пока срок не истёк, задача принадлежит взявшему её воркеру;
+    # задачу упавшего воркера после срока заберёт другой.
+    locked_until = models.DateTimeField(null=True, blank=True)
+    # Метка захвата: результат и продление принимаются только от
+    # воркера, который задачу сейчас держит.
+    lock_token = models.CharField(max_length=32, blank=True)
+    # Хэш имени и аргументов задачи с unique=True; в очереди может
+    # ждать только одна задача с таким ключом.
+    unique_key = models.CharField(max_length=32, null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unique_key'], condition=models.Q(status='q'),
+                name='task_unique_queued'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} [{self.get_status_display()}]'
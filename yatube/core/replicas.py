@@ -0,0 +1,113 @@
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Кто сам что-то записал, REPLICA_STICKY_SECONDS читает только основную
+# базу: реплики могут ещё не догнать его запись.
+STICKY_COOKIE = 'primary'
+
+_state = threading.local()
+
+
+def replica_alias():
+    """Реплика для чтения в текущем потоке или None — основная база."""
+    if getattr(_state, 'wrote', False) or getattr(_state, 'sticky', False):
+        return None
+    return getattr(_state, 'replica', None)
+
+
+def read_from_replica():
+    """
+    Читало ли текущее представление с реплики. Собранное из таких данных
+    может отставать от основной базы при уже сдвинутых версиях ключей:
+    в кэш оно не кладётся и валидаторами не помечается.
+    """
+    return getattr(_state, 'read_replica', False)
+
+
+class ReplicaRouter:
+    """
+    Записи идут в основную базу. Чтение уходит на реплику только внутри
+    представлений с replica_reads, пока в запросе ничего не записано и
+    читатель не закреплён за основной базой после своих записей.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias is None:
+            return DEFAULT_DB_ALIAS
+        _state.read_replica = True
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Данные на репликах те же, что в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными основной базы.
+        return db == DEFAULT_DB_ALIAS
+
+
+def replica_reads(view):
+    """
+    Разрешает представлению читать с реплики из REPLICA_DATABASES.
+    Реплика выбирается одна на запрос, чтобы данные на странице были
+    согласованы между собой.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.REPLICA_DATABASES:
+            return view(request, *args, **kwargs)
+        previous = getattr(_state, 'replica', None), read_from_replica()
+        _state.replica = random.choice(settings.REPLICA_DATABASES)
+        _state.read_replica = False
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _state.replica, _state.read_replica = previous
+    return wrapper
+
+
+class ReplicaMiddleware:
+    """
+    Закрепляет за основной базой на REPLICA_STICKY_SECONDS того, чей
+    запрос что-то записал, включая сессию. Стоит до SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.sticky = STICKY_COOKIE in request.COOKIES
+        _state.wrote = False
+        _state.replica = None
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote
+        finally:
+            _state.sticky = _state.wrote = False
+        if wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
+
+
+def copy_database(source, target):
+    """
+    Копирует SQLite-базу source в target целиком. Так копия становится
+    репликой при разработке и в тестах.
+    """
+    for alias in (source, target):
+        if connections[alias].vendor != 'sqlite':
+            raise ImproperlyConfigured(f'{alias}: копируются только SQLite')
+        connections[alias].ensure_connection()
+    connections[source].connection.backup(connections[target].connection)
@@ -0,0 +1,29 @@
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+def use_temp_caches(directory):
+    """
+    Переносит файлы кэшей во временный каталог: тесты чистят кэш и не
+    должны трогать кэш запущенного рядом сервера.
+    """
+    caches = copy.deepcopy(settings.CACHES)
+    for alias, config in caches.items():
+        config['LOCATION'] = os.path.join(directory, f'{alias}.sqlite3')
+    settings.CACHES = caches
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        self.cache_dir = tempfile.mkdtemp()
+        use_temp_caches(self.cache_dir)
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
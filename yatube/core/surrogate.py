@@ -0,0 +1,84 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from .replicas import read_from_replica
+
+
+def surrogate_key(kind, ident):
+    """Суррогатный ключ вида 'post:42': то, от чего зависит кэш."""
+    return f'{kind}:{ident}'
+
+
+def version_key(key):
+    return f'surrogate:{key}'
+
+
+def purge(*keys):
+    """
+    Сдвигает версии ключей. Всё закэшированное с этими ключами
+    становится недостижимым и вытесняется из кэша со временем само.
+    """
+    if keys:
+        version = time.time_ns()
+        cache.set_many({version_key(key): version for key in keys}, None)
+
+
+def versions(keys):
+    """Версии ключей; недостающие заводятся текущим временем."""
+    keys = set(keys)
+    found = cache.get_many([version_key(key) for key in keys])
+    result = {key: found.get(version_key(key)) for key in keys}
+    missing = {key for key, version in result.items() if version is None}
+    if missing:
+        version = time.time_ns()
+        cache.set_many({version_key(key): version for key in missing}, None)
+        result.update(dict.fromkeys(missing, version))
+    return result
+
+
+def stamp(keys):
+    """Отпечаток текущих версий ключей для имени записи в кэше."""
+    current = sorted(versions(keys).items())
+    return hashlib.md5(repr(current).encode()).hexdigest()
+
+
+def cached(name, keys, render, timeout=None):
+    """
+    Фрагмент из кэша или render(). Запись живёт, пока не сдвинута
+    версия ни одного из keys. Отрисованное по данным реплики не
+    сохраняется: они могут быть старше версий.
+    """
+    cache_key = f'fragment:{name}:{stamp(keys)}'
+    value = cache.get(cache_key)
+    if value is None:
+        value = render()
+        if not read_from_replica():
+            cache.set(cache_key, value, timeout)
+    return value
+
+
+def add_header(response, keys):
+    """Surrogate-Key для CDN, чистящих кэш по тем же ключам."""
+    response['Surrogate-Key'] = ' '.join(sorted(set(keys)))
+    return response
+
+
+def depends(model, keys):
+    """
+    Объявляет, какие ключи сдвигаются при сохранении и удалении строк
+    model. keys(instance, created, update_fields) возвращает список
+    ключей; при удалении created и update_fields равны None.
+    """
+    uid = f'surrogate:{model._meta.label}'
+
+    def saved(sender, instance, created, update_fields, **kwargs):
+        purge(*keys(instance, created, update_fields))
+
+    def deleted(sender, instance, **kwargs):
+        purge(*keys(instance, None, None))
+
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=uid)
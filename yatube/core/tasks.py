@@ -0,0 +1,307 @@
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing
+import random
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def task(queue='default', max_attempts=None, unique=False):
+    """
+    Делает функцию фоновой задачей: func.delay(*args, **kwargs) кладёт
+    вызов в таблицу задач, func.schedule(seconds, *args, **kwargs) — с
+    отсрочкой. Запись идёт в текущей транзакции, так что задача появится
+    вместе с изменениями, которые её породили, или не появится вовсе.
+    Аргументы должны сериализоваться в JSON. Задача с unique=True не
+    ставится повторно, пока такая же ждёт в очереди.
+    """
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__qualname__}'
+
+        def schedule(seconds, *args, **kwargs):
+            return enqueue(
+                func, args, kwargs, queue, max_attempts, unique, seconds)
+
+        def delay(*args, **kwargs):
+            return schedule(0, *args, **kwargs)
+
+        func.delay = delay
+        func.schedule = schedule
+        return func
+    return decorator
+
+
+def enqueue(func, args, kwargs, queue='default', max_attempts=None,
+            unique=False, countdown=0):
+    if settings.TASKS_EAGER:
+        func(*args, **kwargs)
+        return None
+    args, kwargs = json.dumps(list(args)), json.dumps(kwargs)
+    fields = {
+        'name': func.task_name,
+        'args': args,
+        'kwargs': kwargs,
+        'queue': queue,
+        'max_attempts': max_attempts or settings.TASK_MAX_ATTEMPTS,
+        'run_at': timezone.now() + timedelta(seconds=countdown),
+    }
+    if not unique:
+        return Task.objects.create(**fields)
+    # Условная вставка: вторую такую же ждущую задачу не пропустит
+    # уникальный индекс, и тогда возвращается уже стоящая в очереди.
+    key = hashlib.md5(
+        f'{func.task_name}:{args}:{kwargs}'.encode()).hexdigest()
+    while True:
+        try:
+            with transaction.atomic():
+                return Task.objects.create(unique_key=key, **fields)
+        except IntegrityError:
+            waiting = Task.objects.filter(
+                unique_key=key, status=Task.QUEUED).first()
+            if waiting is not None:
+                return waiting
+
+
+def resolve(name):
+    module, attr = name.rsplit('.', 1)
+    func = getattr(importlib.import_module(module), attr, None)
+    # Выполняются только функции, объявленные задачами.
+    if getattr(func, 'task_name', None) != name:
+        raise LookupError(f'Unknown task {name}')
+    return func
+
+
+def execute(name, args, kwargs):
+    """Выполняет задачу; вызывается в процессе пула или в самом воркере."""
+    return resolve(name)(*json.loads(args), **json.loads(kwargs))
+
+
+def in_queues(tasks, queues):
+    return tasks.filter(queue__in=queues) if queues else tasks
+
+
+def due(now, queues=None):
+    return in_queues(Task.objects.filter(
+        Q(status=Task.QUEUED, run_at__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now,
+            attempts__lt=F('max_attempts'))
+    ), queues)
+
+
+def fail_abandoned(now, queues=None):
+    """
+    Задачи, чей захват истёк на последней попытке, помечаются FAILED:
+    задача, которая раз за разом роняет или вешает воркер, иначе
+    выдавалась бы заново бесконечно.
+    """
+    abandoned = in_queues(Task.objects.filter(
+        status=Task.RUNNING, locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+    ), queues)
+    for pk, name in abandoned.values_list('pk', 'name'):
+        if abandoned.filter(pk=pk).update(
+                status=Task.FAILED, locked_until=None,
+                last_error='Worker lost the task on its last attempt'):
+            logger.error('Task %s #%s failed: worker lost', name, pk)
+
+
+def claim(limit, queues=None):
+    """
+    Забирает до limit созревших задач. Каждая захватывается условным
+    UPDATE: если другой воркер успел первым, строка не обновится и
+    задача достанется ему. Блокировок строк не нужно, что работает и
+    на SQLite.
+    """
+    now = timezone.now()
+    fail_abandoned(now, queues)
+    claimed = []
+    candidates = due(now, queues).order_by('run_at').values_list(
+        'pk', flat=True)[:limit]
+    for pk in candidates:
+        if due(now, queues).filter(pk=pk).update(
+            status=Task.RUNNING,
+            locked_until=now + timedelta(seconds=settings.TASK_LEASE),
+            lock_token=uuid.uuid4().hex,
+            attempts=F('attempts') + 1,
+        ):
+            claimed.append(pk)
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_at'))
+
+
+def held(task):
+    """Задача, пока её держит тот, кто её взял."""
+    return Task.objects.filter(
+        pk=task.pk, status=Task.RUNNING, lock_token=task.lock_token)
+
+
+def renew(tasks):
+    """Продлевает захват задач, у которых прошла половина срока."""
+    now = timezone.now()
+    lease = timedelta(seconds=settings.TASK_LEASE)
+    for task in tasks:
+        if task.locked_until - now < lease / 2:
+            if held(task).update(locked_until=now + lease):
+                task.locked_until = now + lease
+
+
+class Heartbeat(threading.Thread):
+    """Продлевает захват задачи, выполняемой в этом же процессе."""
+
+    def __init__(self, task):
+        super().__init__(daemon=True)
+        self.task = task
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.TASK_LEASE / 4):
+                renew([self.task])
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def prune():
+    """Удаляет выполненные задачи старше TASK_KEEP_DONE."""
+    before = timezone.now() - timedelta(seconds=settings.TASK_KEEP_DONE)
+    return Task.objects.filter(
+        status=Task.DONE, run_at__lt=before).delete()[0]
+
+
+def backoff(attempt):
+    """Экспоненциальная пауза перед повтором со случайным разбросом."""
+    delay = min(
+        settings.TASK_RETRY_MAX_DELAY,
+        settings.TASK_RETRY_DELAY * 2 ** (attempt - 1),
+    )
+    return timedelta(seconds=delay * random.uniform(1, 1.25))
+
+
+def finish(task, error=None):
+    tasks = held(task)
+    if error is None:
+        updated = tasks.update(
+            status=Task.DONE, locked_until=None, last_error='')
+    elif task.attempts >= task.max_attempts:
+        logger.error('Task %s #%s failed: %s', task.name, task.pk, error)
+        updated = tasks.update(
+            status=Task.FAILED, locked_until=None, last_error=error)
+    else:
+        try:
+            with transaction.atomic():
+                updated = tasks.update(
+                    status=Task.QUEUED,
+                    locked_until=None,
+                    last_error=error,
+                    run_at=timezone.now() + backoff(task.attempts),
+                )
+        except IntegrityError:
+            # Такая же уникальная задача уже ждёт и выполнит работу.
+            updated = tasks.update(
+                status=Task.FAILED, locked_until=None, last_error=error)
+    if not updated:
+        # Срок захвата истёк, и задачу взял другой воркер: её судьбу
+        # теперь записывает он.
+        logger.warning('Task %s #%s lease lost', task.name, task.pk)
+
+
+def format_error(error):
+    return ''.join(traceback.format_exception(
+        type(error), error, error.__traceback__))
+
+
+def run_pending(queues=None):
+    """Выполняет созревшие задачи прямо в текущем процессе."""
+    count = 0
+    while True:
+        tasks = claim(1, queues)
+        if not tasks:
+            return count
+        heartbeat = Heartbeat(tasks[0])
+        heartbeat.start()
+        try:
+            execute(tasks[0].name, tasks[0].args, tasks[0].kwargs)
+        except Exception as error:
+            heartbeat.stop()
+            finish(tasks[0], format_error(error))
+        else:
+            heartbeat.stop()
+            finish(tasks[0])
+        count += 1
+
+
+class Worker:
+    """
+    Воркер очереди: забирает задачи не больше, чем свободных процессов в
+    пуле, и раздаёт их пулу. Процессы запускаются через spawn и
+    настраивают Django заново, результаты записывает сам воркер.
+    """
+
+    def __init__(self, workers, queues=None):
+        self.workers = workers
+        self.queues = queues
+        self.running = {}
+        self.pruned = 0
+
+    def submit(self, pool):
+        free = self.workers - len(self.running)
+        for task in claim(free, self.queues) if free else []:
+            future = pool.submit(execute, task.name, task.args, task.kwargs)
+            self.running[future] = task
+
+    def collect(self, timeout):
+        done, _ = wait(
+            self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            task = self.running.pop(future)
+            error = future.exception()
+            finish(task, None if error is None else format_error(error))
+        # Задачи, которые выполняются дольше половины срока захвата,
+        # не должны достаться другому воркеру.
+        renew(self.running.values())
+
+    def maintain(self):
+        if time.monotonic() - self.pruned >= settings.TASK_PRUNE_INTERVAL:
+            prune()
+            self.pruned = time.monotonic()
+
+    def run(self, once=False):
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+        try:
+            while True:
+                self.maintain()
+                self.submit(pool)
+                if self.running:
+                    self.collect(settings.TASK_POLL_INTERVAL)
+                elif once:
+                    return
+                else:
+                    time.sleep(settings.TASK_POLL_INTERVAL)
+        finally:
+            # Взятые задачи доделываются и записываются даже при остановке.
+            pool.shutdown(wait=True)
+            while self.running:
+                self.collect(settings.TASK_POLL_INTERVAL)
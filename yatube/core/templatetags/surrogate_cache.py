@@ -0,0 +1,39 @@
+from django import template
+
+from core import surrogate
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, keys):
+        self.nodelist = nodelist
+        self.name = name
+        self.keys = keys
+
+    def render(self, context):
+        return surrogate.cached(
+            self.name.resolve(context),
+            [str(key.resolve(context)) for key in self.keys],
+            lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag
+def cached_fragment(parser, token):
+    """
+    {% cached_fragment 'имя' 'post:42' 'user:7' %}…{% endcached_fragment %}
+    Кэширует фрагмент, пока не сдвинута версия ни одного из ключей.
+    Внутри не должно быть ничего, что зависит от читателя.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' takes a name and at least one surrogate key")
+    nodelist = parser.parse(('endcached_fragment',))
+    parser.delete_first_token()
+    return CachedFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -1,4 +1,27 @@
-from django.test import TestCase
+import os
+import shutil
+import smtplib
+import tempfile
+from datetime import timedelta
+from email.mime.image import MIMEImage
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import mail as queued_mail
+from . import surrogate
+from .cache import SQLiteCache
+from .models import Task
+from .replicas import STICKY_COOKIE, copy_database
+from .tasks import claim, finish, prune, renew, run_pending, task
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +29,380 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+CALLS = []
+
+
+@task()
+def record(value, **kwargs):
+    CALLS.append((value, kwargs))
+
+
+@task(unique=True)
+def record_once(value):
+    CALLS.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise ValueError('boom')
+
+
+def not_a_task():
+    CALLS.append('not a task')
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_delay_and_run(self):
+        """Задача ставится в очередь и выполняется воркером"""
+        queued = record.delay(1, key='value')
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertEqual(CALLS, [])
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(CALLS, [(1, {'key': 'value'})])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.DONE)
+        self.assertEqual(queued.attempts, 1)
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача откладывается и после лимита попыток падает"""
+        queued = explode.delay()
+        run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('boom', queued.last_error)
+        Task.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_claim_once(self):
+        """Задачу берёт один воркер, пока не истёк срок захвата"""
+        queued = record.delay(1)
+        self.assertEqual(claim(10), [queued])
+        self.assertEqual(claim(10), [])
+        Task.objects.filter(pk=queued.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim(10), [queued])
+
+    def test_only_declared_tasks_run(self):
+        """Из очереди выполняются только функции, объявленные задачами"""
+        queued = Task.objects.create(
+            name='core.tests.not_a_task', max_attempts=1)
+        run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(CALLS, [])
+
+    def test_schedule_unique(self):
+        """Отложенная уникальная задача не ставится повторно"""
+        queued = record_once.schedule(60, 1)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertEqual(record_once.schedule(60, 1), queued)
+        self.assertNotEqual(record_once.delay(2), queued)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(CALLS, [2])
+
+    def test_unique_is_enforced(self):
+        """Вторая такая же ждущая задача не вставится и в обход enqueue"""
+        queued = record_once.delay(1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Task.objects.create(
+                name=queued.name, unique_key=queued.unique_key)
+        claim(1)
+        self.assertNotEqual(record_once.delay(1), queued)
+
+    def test_lost_lease(self):
+        """Воркер, упустивший задачу, не перезаписывает её результат"""
+        record.delay(1)
+        [first] = claim(1)
+        Task.objects.filter(pk=first.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        [second] = claim(1)
+        with self.assertLogs('core.tasks', level='WARNING'):
+            finish(first)
+        self.assertEqual(Task.objects.get(pk=first.pk).status, Task.RUNNING)
+        finish(second)
+        self.assertEqual(Task.objects.get(pk=first.pk).status, Task.DONE)
+
+    def test_lost_lease_on_last_attempt(self):
+        """Задача, упущенная на последней попытке, больше не выдаётся"""
+        explode.delay()
+        for attempt in range(2):
+            [claimed] = claim(1)
+            Task.objects.filter(pk=claimed.pk).update(
+                locked_until=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs('core.tasks', level='ERROR'):
+            self.assertEqual(claim(1), [])
+        failed = Task.objects.get(pk=claimed.pk)
+        self.assertEqual((failed.status, failed.attempts), (Task.FAILED, 2))
+
+    def test_renew(self):
+        """Долгой задаче продлевается срок захвата"""
+        record.delay(1)
+        [claimed] = claim(1)
+        soon = timezone.now() + timedelta(seconds=1)
+        Task.objects.filter(pk=claimed.pk).update(locked_until=soon)
+        claimed.locked_until = soon
+        renew([claimed])
+        self.assertGreater(
+            Task.objects.get(pk=claimed.pk).locked_until,
+            soon + timedelta(seconds=settings.TASK_LEASE / 2))
+
+    def test_prune(self):
+        """Давно выполненные задачи удаляются, упавшие остаются"""
+        old = timezone.now() - timedelta(seconds=settings.TASK_KEEP_DONE + 1)
+        for status in (Task.DONE, Task.FAILED):
+            Task.objects.create(name='old', status=status, run_at=old)
+        recent = Task.objects.create(name='recent', status=Task.DONE)
+        self.assertEqual(prune(), 1)
+        self.assertEqual(
+            sorted(Task.objects.values_list('status', flat=True)),
+            [Task.DONE, Task.FAILED])
+        self.assertTrue(Task.objects.filter(pk=recent.pk).exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager(self):
+        """В режиме TASKS_EAGER задача выполняется сразу"""
+        self.assertIsNone(record.delay(2))
+        self.assertEqual(CALLS, [(2, {})])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+    EMAIL_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class QueuedEmailTest(TestCase):
+    def test_password_reset_is_queued(self):
+        """Письмо сброса пароля уходит в очередь, а не в SMTP"""
+        get_user_model().objects.create_user(
+            username='user', email='user@example.com', password='pass')
+        self.client.post(
+            reverse('users:password_reset_form'),
+            {'email': 'user@example.com'},
+        )
+        self.assertEqual(mail.outbox, [])
+        self.assertTrue(Task.objects.filter(queue='mail').exists())
+        run_pending(['mail'])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+
+    def test_connection_is_reused(self):
+        """Пачки писем отправляются через одно открытое соединение"""
+        message = EmailMultiAlternatives(
+            'Тема', 'Текст', 'from@example.com', ['to@example.com'])
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.attach('file.txt', 'содержимое', 'text/plain')
+        message.send()
+        message.send()
+        with mock.patch('core.mail.get_connection',
+                        wraps=queued_mail.get_connection) as connect:
+            queued_mail.delivery._close()
+            # Второе письмо забирает из очереди задача первого.
+            self.assertEqual(run_pending(), 1)
+        connect.assert_called_once()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            set(Task.objects.values_list('status', flat=True)), {Task.DONE})
+        sent = mail.outbox[0]
+        self.assertEqual(sent.alternatives, [('<p>Текст</p>', 'text/html')])
+        self.assertEqual(
+            sent.attachments,
+            [('file.txt', 'содержимое', 'text/plain')])
+
+    def test_failed_message_is_retried_alone(self):
+        """Повтор пачки не отправляет уже доставленные письма"""
+        for address in ('first@example.com', 'second@example.com'):
+            EmailMultiAlternatives(
+                'Тема', 'Текст', 'from@example.com', [address]).send()
+        send = queued_mail.delivery.send
+
+        def refuse_second(messages):
+            if messages[0].to == ['second@example.com']:
+                raise smtplib.SMTPRecipientsRefused({})
+            return send(messages)
+        with mock.patch.object(queued_mail.delivery, 'send', refuse_second):
+            run_pending()
+        self.assertEqual(
+            [message.to for message in mail.outbox], [['first@example.com']])
+        Task.objects.filter(status=Task.QUEUED).update(run_at=timezone.now())
+        run_pending()
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [['first@example.com'], ['second@example.com']])
+
+    def test_mime_attachment(self):
+        """Готовая MIME-часть доходит со своими заголовками"""
+        image = MIMEImage(b'GIF89a', 'gif')
+        image.add_header('Content-ID', '<logo>')
+        message = EmailMultiAlternatives(
+            'Тема', 'Текст', 'from@example.com', ['to@example.com'])
+        message.attach(image)
+        message.send()
+        run_pending()
+        [part] = mail.outbox[0].attachments
+        self.assertEqual(part['Content-ID'], '<logo>')
+        self.assertEqual(part.get_content_type(), 'image/gif')
+        self.assertEqual(part.get_payload(decode=True), b'GIF89a')
+
+
+class SurrogateKeysTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_fragment_follows_keys(self):
+        """Фрагмент перестраивается после сдвига любого из его ключей"""
+        renders = []
+
+        def render():
+            renders.append(1)
+            return f'render {len(renders)}'
+        keys = ['post:1', 'user:2']
+        self.assertEqual(surrogate.cached('card', keys, render), 'render 1')
+        self.assertEqual(surrogate.cached('card', keys, render), 'render 1')
+        surrogate.purge('user:3')
+        self.assertEqual(surrogate.cached('card', keys, render), 'render 1')
+        surrogate.purge('user:2')
+        self.assertEqual(surrogate.cached('card', keys, render), 'render 2')
+
+    def test_model_dependencies(self):
+        """Сохранение и удаление строки сдвигают объявленные ключи"""
+        user = get_user_model().objects.create_user(username='author')
+        before = surrogate.stamp([f'user:{user.pk}'])
+        user.first_name = 'Имя'
+        user.save()
+        after = surrogate.stamp([f'user:{user.pk}'])
+        self.assertNotEqual(before, after)
+        user.save(update_fields=['last_login'])
+        self.assertEqual(surrogate.stamp([f'user:{user.pk}']), after)
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            {'OPTIONS': options},
+        )
+
+    def test_shared_between_instances(self):
+        """Записи и счётчики видны всем, кто открыл тот же файл"""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('fragment', '<p>Пост</p>')
+        first.set_many({'counter': 1, 'forever': [1, 2]}, None)
+        self.assertEqual(second.get('fragment'), '<p>Пост</p>')
+        self.assertEqual(second.incr('counter', 5), 6)
+        self.assertEqual(first.decr('counter'), 5)
+        self.assertEqual(
+            second.get_many(['counter', 'forever', 'missing']),
+            {'counter': 5, 'forever': [1, 2]},
+        )
+        self.assertFalse(second.add('counter', 0))
+        second.delete('counter')
+        self.assertTrue(first.add('counter', 0))
+        with self.assertRaises(ValueError):
+            first.incr('fragment')
+
+    def test_expiry(self):
+        """Просроченная запись не читается и не мешает add"""
+        cache = self.make_cache()
+        cache.set('key', 'value', 0)
+        self.assertIsNone(cache.get('key'))
+        self.assertFalse(cache.has_key('key'))
+        self.assertTrue(cache.add('key', 'new'))
+        self.assertTrue(cache.touch('key', 0))
+        self.assertIsNone(cache.get('key'))
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные записи"""
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, ACCESS_RESOLUTION=0)
+        with mock.patch('core.cache.time.time') as clock:
+            for tick, key in enumerate(('a', 'b', 'c')):
+                clock.return_value = tick
+                cache.set(key, tick, None)
+            clock.return_value = 10
+            cache.get('a')
+            clock.return_value = 11
+            cache.set('d', 3, None)
+        self.assertEqual(
+            sorted(cache.get_many(['a', 'b', 'c', 'd'])), ['a', 'c', 'd'])
+
+    def test_size_limit(self):
+        """Суммарный размер значений не превышает MAX_SIZE"""
+        cache = self.make_cache(MAX_SIZE=1000)
+        for i in range(10):
+            cache.set(f'key{i}', 'x' * 300)
+        size = cache._connection().execute(
+            'SELECT bytes FROM totals').fetchone()[0]
+        self.assertLessEqual(size, 1000)
+        self.assertEqual(
+            size,
+            cache._connection().execute(
+                'SELECT SUM(size) FROM cache').fetchone()[0],
+        )
+        self.assertIsNotNone(cache.get('key9'))
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    # Копия снимается только с закоммиченных данных.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = get_user_model().objects.create_user(username='author')
+        # Реплика — копия тестовой базы, которая дальше не обновляется:
+        # всё записанное после копии видно только основной.
+        copy_database('default', 'replica')
+
+    def feed_ids(self):
+        response = self.client.get(reverse('api:index'))
+        return [post['id'] for post in response.json()['results']]
+
+    def test_reads_from_replica_until_own_write(self):
+        """Ленты читаются с реплики, а после своей записи — с основной"""
+        post = self.author.posts.create(text='Пост после копии')
+        self.assertEqual(self.feed_ids(), [])
+        self.assertNotIn(STICKY_COOKIE, self.client.cookies)
+        self.client.force_login(self.author)
+        response = self.client.post(
+            reverse('posts:post_like', args=(post.id,)))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.feed_ids(), [post.id])
+        del self.client.cookies[STICKY_COOKIE]
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_other_pages_read_primary(self):
+        """Страницы без replica_reads не видят отставания реплики"""
+        post = self.author.posts.create(text='Пост после копии')
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.id,)))
+        self.assertContains(response, 'Пост после копии')
+
+    def test_stale_replica_does_not_poison_cache(self):
+        """Отставшая реплика не кладёт старое под новые версии ключей"""
+        post = self.author.posts.create(text='Текст до правки')
+        copy_database('default', 'replica')
+        post.text = 'Текст после правки'
+        post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Текст до правки')
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('ETag', self.client.get(reverse('api:index')))
+        # Основная база отдаёт правку, а не карточку, собранную по реплике.
+        self.client.cookies[STICKY_COOKIE] = '1'
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Текст после правки')
+        self.assertIn('ETag', self.client.get(reverse('api:index')))
@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import Post, Group, Comment, Follow, Like, Membership
+from .models import (Post, Group, Comment, Follow, Like, Membership,
+                     FeedEntry, UserStats, Profile, Event, Digest,
+                     TrendingPost)
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -23,3 +25,9 @@ admin.site.register(Comment)
 admin.site.register(Follow)
 admin.site.register(Like)
 admin.site.register(Membership)
+admin.site.register(FeedEntry)
+admin.site.register(UserStats)
+admin.site.register(Profile)
+admin.site.register(Event)
+admin.site.register(Digest)
+admin.site.register(TrendingPost)
@@ -0,0 +1,150 @@
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.urls import reverse
+
+from core import surrogate
+from core.surrogate import surrogate_key
+
+from .models import Group, User
+from .search import WORD_RE
+
+# Сдвигается при создании и удалении пользователя или группы и при правке
+# полей, по которым ищут, в каком бы процессе это ни случилось.
+INDEX_KEY = surrogate_key('autocomplete', 'all')
+INDEX_FIELDS = {
+    User: ('username', 'first_name', 'last_name'),
+    Group: ('slug', 'title'),
+}
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def indexed_values(instance):
+    # Отложенные поля не подгружаются: загруженными они не были.
+    return tuple(instance.__dict__.get(field)
+                 for field in INDEX_FIELDS[instance._meta.concrete_model])
+
+
+def remember(instance):
+    """Запоминает поля для поиска в том виде, в каком их прочли из базы."""
+    instance._indexed_values = indexed_values(instance)
+
+
+def index_changed(instance, created, update_fields):
+    """
+    Нужно ли перестраивать индекс после сохранения (created — True или
+    False) или удаления (created — None) записи.
+    """
+    if created is not False:
+        return True
+    fields = INDEX_FIELDS[instance._meta.concrete_model]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return False
+    changed = getattr(instance, '_indexed_values', None) != (
+        indexed_values(instance))
+    remember(instance)
+    return changed
+
+
+def user_entry(user):
+    full_name = user.get_full_name()
+    texts = [user.username, full_name] + WORD_RE.findall(full_name)
+    return {
+        'type': 'user',
+        'label': full_name or user.username,
+        'value': user.username,
+        'url': reverse('posts:profile', args=(user.username,)),
+    }, texts
+
+
+def group_entry(group):
+    texts = [group.slug, group.title] + WORD_RE.findall(group.title)
+    return {
+        'type': 'group',
+        'label': group.title,
+        'value': group.slug,
+        'url': reverse('posts:group_posts', args=(group.slug,)),
+    }, texts
+
+
+class PrefixIndex:
+    """
+    Индекс для подсказок по началу слова: отсортированный список пар
+    (ключ, id записи), поиск — bisect до первого ключа с префиксом и
+    проход вперёд, пока ключи с него начинаются. Индекс свой у каждого
+    процесса, строится на первом запросе к сайту и заново из базы, когда
+    сдвигается версия INDEX_KEY, так что в остальное время подсказки в
+    базу не ходят.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stamp = None
+
+    def _load(self, stamp):
+        self._keys = []
+        self._entries = {}
+        for user in User.objects.all():
+            self._add(('user', user.pk), *user_entry(user))
+        for group in Group.objects.all():
+            self._add(('group', group.pk), *group_entry(group))
+        self._keys.sort()
+        self._stamp = stamp
+
+    def _add(self, entry_id, entry, texts):
+        keys = {normalize(text) for text in texts if text}
+        self._entries[entry_id] = (entry, keys)
+        self._keys.extend((key, entry_id) for key in keys)
+
+    def refresh(self):
+        # Версия читается до базы: правка, случившаяся во время
+        # загрузки, сдвинет её ещё раз и вызовет новую загрузку.
+        stamp = surrogate.stamp([INDEX_KEY])
+        with self._lock:
+            if stamp != self._stamp:
+                self._load(stamp)
+
+    def search(self, prefix, limit):
+        prefix = normalize(prefix.strip())
+        if not prefix:
+            return []
+        self.refresh()
+        with self._lock:
+            found = {}
+            position = bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(found) < limit:
+                key, entry_id = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                found.setdefault(entry_id, self._entries[entry_id][0])
+                position += 1
+            return list(found.values())
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PrefixIndex()
+    return _index
+
+
+def reset_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def suggest(prefix):
+    return get_index().search(prefix, settings.AUTOCOMPLETE_LIMIT)
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.timezone import get_current_timezone_name
+
+from core import surrogate
+from core.replicas import read_from_replica
+from core.surrogate import surrogate_key
+
+
+def card_surrogate_keys(post):
+    """От чего зависит карточка: сам пост, его автор и группа."""
+    keys = [surrogate_key('post', post.id),
+            surrogate_key('user', post.author_id)]
+    if post.group_id:
+        keys.append(surrogate_key('group', post.group_id))
+    return keys
+
+
+def render_cards(posts, authenticated):
+    """
+    Собирает карточки постов из кэша. Ключ карточки включает версии
+    поста, автора и группы, активный часовой пояс, отметку лайка и то,
+    вошёл ли читатель (гостю кнопка лайка не показывается), так что
+    изменение любой из них просто делает старую карточку недостижимой.
+    Карточки постов, прочитанных с реплики, в кэш не кладутся: иначе
+    отставшая копия легла бы под уже новые версии.
+    """
+    versions = surrogate.versions(
+        {key for post in posts for key in card_surrogate_keys(post)})
+    timezone = get_current_timezone_name()
+    card_keys = {}
+    for post in posts:
+        stamp = '.'.join(
+            str(versions[key]) for key in card_surrogate_keys(post))
+        liked = int(bool(getattr(post, 'is_liked', False)))
+        # Миниатюры готовит воркер очереди: отметка в ключе не зависит от
+        # того, увидел ли этот процесс новую версию поста.
+        ready = int(post.thumbnails_ready)
+        card_keys[post.id] = (
+            f'post_card:{post.id}:{stamp}:{timezone}:'
+            f'{int(authenticated)}{liked}{ready}')
+    cards = cache.get_many(card_keys.values())
+    rendered = {}
+    for post in posts:
+        key = card_keys[post.id]
+        if key not in cards:
+            cards[key] = rendered[key] = render_to_string(
+                'posts/includes/article.html',
+                {'post': post, 'authenticated': authenticated},
+            )
+    if rendered and not read_from_replica():
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return [cards[card_keys[post.id]] for post in posts]
@@ -0,0 +1,95 @@
+import hashlib
+
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.timezone import get_current_timezone_name
+
+from core import surrogate
+from core.replicas import read_from_replica
+from core.surrogate import surrogate_key
+
+from .notifications import unread_count
+
+# Меняется при создании, правке и удалении любого поста: от этого
+# зависит, какие посты попадают на страницу ленты.
+FEEDS_KEY = surrogate_key('feeds', 'all')
+GROUPS_KEY = surrogate_key('groups', 'all')
+
+
+def validators(keys, parts=(), since=()):
+    """
+    Строгий ETag и Last-Modified ответа по версиям суррогатных ключей.
+    keys — объекты в теле ответа, parts — остальное, от чего зависит тело
+    (id на странице, курсоры, лайки). Версии since сдвигают только
+    Last-Modified: ETag и так меняется, когда меняется состав страницы.
+    """
+    keys = set(keys)
+    versions = surrogate.versions(keys | set(since))
+    content = sorted((key, versions[key]) for key in keys)
+    etag = hashlib.md5(repr((content, parts)).encode()).hexdigest()
+    return quote_etag(etag), max(versions.values()) // 10**9
+
+
+def not_modified(request, etag, last_modified):
+    """Ответ 304, если у клиента актуальная копия, иначе None."""
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Валидаторы строятся по текущим версиям, а ответ по данным реплики
+    может быть старше их: такой ответ остаётся без валидаторов, чтобы
+    клиент не подтверждал им отставшую копию.
+    """
+    if read_from_replica():
+        return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def stats_parts(stats):
+    return (stats.posts_count, stats.followers_count,
+            stats.followings_count, stats.groups_count)
+
+
+def page_parts(page_obj):
+    """Что на странице ленты влияет на HTML помимо версий постов."""
+    return (
+        [(post.id, getattr(post, 'is_liked', None), post.thumbnails_ready)
+         for post in page_obj],
+        page_obj.number,
+        page_obj.paginator.num_pages,
+        getattr(page_obj, 'next_cursor', None),
+        getattr(page_obj, 'previous_cursor', None),
+    )
+
+
+def render_conditional(request, template, context, keys, parts=(),
+                       since=()):
+    """
+    render() для GET-страниц с ETag и Last-Modified. Проверка стоит
+    чтения версий из кэша; context вызывается и шаблон отрисовывается,
+    только если у клиента нет актуальной копии. Шапка и время в постах
+    зависят от читателя, его часового пояса и числа уведомлений, формы —
+    от csrf-токена, который меняется при каждом входе.
+    """
+    user = request.user
+    # Токен всё равно попадёт в шаблон; без cookie заводим его заранее,
+    # чтобы ETag совпал и на следующем запросе, уже с cookie.
+    get_token(request)
+    viewer = (
+        user.pk,
+        get_current_timezone_name(),
+        unread_count(user) if user.is_authenticated else 0,
+        request.META.get('CSRF_COOKIE'),
+    )
+    etag, last_modified = validators(keys, (parts, viewer), since)
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        response = render(request, template, context())
+    surrogate.add_header(response, keys)
+    return set_validators(response, etag, last_modified)
@@ -0,0 +1,45 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field, **filters):
+    """Подзапрос с числом строк model, ссылающихся на внешний объект."""
+    rows = model.objects.filter(
+        **{field: OuterRef('pk')}, **filters).order_by()
+    return Coalesce(
+        Subquery(
+            rows.values(field).annotate(num=Count('pk')).values('num'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def rebuild_post_counters(post_model, like_model, comment_model):
+    return post_model.objects.update(
+        likes_count=count_subquery(like_model, 'post'),
+        comments_count=count_subquery(comment_model, 'post'),
+    )
+
+
+def rebuild_user_stats(user_stats_model, post_model, follow_model,
+                       membership_model, users, digest_model=None):
+    """
+    digest_model необязателен: миграции, написанные до уведомлений,
+    вызывают функцию без него.
+    """
+    user_stats_model.objects.bulk_create(
+        [user_stats_model(user_id=pk)
+         for pk in users.values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    counters = {
+        'posts_count': count_subquery(post_model, 'author'),
+        'followers_count': count_subquery(follow_model, 'author'),
+        'followings_count': count_subquery(follow_model, 'user'),
+        'groups_count': count_subquery(membership_model, 'member'),
+    }
+    if digest_model is not None:
+        counters['unread_notifications'] = count_subquery(
+            digest_model, 'recipient', read=False)
+    return user_stats_model.objects.filter(user__in=users).update(**counters)
@@ -0,0 +1,56 @@
+from operator import attrgetter
+
+from django.db.models import Exists, OuterRef
+
+from .models import Like, Post
+
+
+# Поля, от которых зависят ключи карточек и валидаторы страницы.
+STUB_FIELDS = ('pub_date', 'author', 'group', 'thumbnails_ready')
+
+
+def liked_by(post_list, viewer):
+    """Для авторизованного читателя добавляет признак is_liked."""
+    if viewer is not None and viewer.is_authenticated:
+        post_list = post_list.annotate(is_liked=Exists(
+            Like.objects.filter(post=OuterRef('pk'), user=viewer)))
+    return post_list
+
+
+def with_viewer(post_list, viewer):
+    """
+    Готовит посты ленты к отрисовке за один запрос: автор и группа
+    подтягиваются join'ом, счётчики лежат в самой таблице постов, а для
+    авторизованного читателя добавляется признак is_liked.
+    """
+    return liked_by(post_list.select_related('author', 'group'), viewer)
+
+
+def posts_feed(viewer, *args, **filters):
+    return with_viewer(Post.objects.filter(*args, **filters), viewer)
+
+
+def posts_stubs(viewer, *args, **filters):
+    """
+    Лёгкие строки ленты: только то, из чего считаются ETag и ключи
+    страницы. Посты целиком загружает load_page, когда ответ нужен.
+    """
+    return liked_by(
+        Post.objects.filter(*args, **filters).only(*STUB_FIELDS), viewer)
+
+
+def posts_loader(viewer, key=attrgetter('post_id'), stubs=False):
+    """Загрузчик страницы для пагинатора, листающего не таблицу постов."""
+    def load(rows):
+        ids = [key(row) for row in rows]
+        posts = posts_stubs(viewer) if stubs else posts_feed(viewer)
+        posts = posts.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+    return load
+
+
+def load_page(page_obj, viewer):
+    """Заменяет лёгкие строки страницы постами целиком."""
+    page_obj.object_list = posts_loader(viewer, key=attrgetter('id'))(
+        list(page_obj.object_list))
+    return page_obj
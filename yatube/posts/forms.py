@@ -1,7 +1,9 @@
+import pytz
+
 from django import forms
 from django.contrib.auth import get_user_model
 
-from .models import Post, Comment, Group
+from .models import Post, Comment, Group, Profile
 
 
 User = get_user_model()
@@ -25,6 +27,20 @@ class ProfileForm(forms.ModelForm):
         fields = ('first_name', 'last_name',)
 
 
+class TimezoneForm(forms.ModelForm):
+    timezone = forms.ChoiceField(
+        choices=[('', '---------')] + [
+            (name, name) for name in pytz.common_timezones],
+        required=False,
+        label='Часовой пояс',
+        help_text='Оставьте пустым для определения по IP',
+    )
+
+    class Meta:
+        model = Profile
+        fields = ('timezone',)
+
+
 class GroupForm(forms.ModelForm):
     class Meta:
         model = Group
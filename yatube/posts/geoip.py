@@ -0,0 +1,109 @@
+import logging
+import threading
+from collections import OrderedDict
+
+import IP2Location
+from django.conf import settings
+
+from .ipindex import IPRangeIndex
+
+logger = logging.getLogger(__name__)
+
+
+class TimezoneLocator:
+    """
+    Общий для процесса определитель часового пояса по IP. Если собран
+    индекс диапазонов (build_ip_index), поиск идёт по нему, иначе по
+    базе IP2Location, отображённой в память. И то и другое открывается
+    один раз при первом обращении, а результаты хранятся в ограниченном
+    LRU-кэше. Библиотека IP2Location сдвигает позицию чтения даже в
+    режиме mmap, поэтому обращения идут под lock.
+    """
+
+    def __init__(self, path, cache_size, index_dir=None):
+        self.path = path
+        self.cache_size = cache_size
+        self.index_dir = index_dir
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._index = None
+        self._database = None
+        self._opened = False
+
+    def _open(self):
+        self._opened = True
+        if self.index_dir and IPRangeIndex.exists(self.index_dir):
+            self._index = IPRangeIndex.load(self.index_dir)
+            return
+        for mode in ('SHARED_MEMORY', 'FILE_IO'):
+            try:
+                self._database = IP2Location.IP2Location(self.path, mode)
+                return
+            except (OSError, ValueError) as error:
+                logger.warning('IP2Location %s unavailable: %s', mode, error)
+
+    def _resolve(self, ips):
+        if self._index is not None:
+            return self._index.lookup(ips)
+        offsets = []
+        for ip in ips:
+            try:
+                offsets.append(self._database.get_timezone(ip))
+            except Exception:
+                offsets.append(None)
+        return offsets
+
+    def get_offsets(self, ips):
+        """Смещения вида '+03:00' (или None) для списка адресов."""
+        with self._lock:
+            found = {}
+            for ip in ips:
+                if ip in self._cache:
+                    self.hits += 1
+                    self._cache.move_to_end(ip)
+                    found[ip] = self._cache[ip]
+            missing = list(dict.fromkeys(
+                ip for ip in ips if ip not in found))
+            if missing:
+                self.misses += len(missing)
+                if not self._opened:
+                    self._open()
+                if self._index is None and self._database is None:
+                    offsets = [None] * len(missing)
+                else:
+                    offsets = self._resolve(missing)
+                for ip, offset in zip(missing, offsets):
+                    found[ip] = self._cache[ip] = offset
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return [found[ip] for ip in ips]
+
+    def get_offset(self, ip):
+        return self.get_offsets([ip])[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._cache),
+            }
+
+
+_locator = None
+_locator_lock = threading.Lock()
+
+
+def get_locator():
+    global _locator
+    if _locator is None:
+        with _locator_lock:
+            if _locator is None:
+                _locator = TimezoneLocator(
+                    settings.IP2LOCATION_DB,
+                    settings.IP_TIMEZONE_CACHE_SIZE,
+                    settings.IP_INDEX_DIR,
+                )
+    return _locator
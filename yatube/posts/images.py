@@ -0,0 +1,11 @@
+from django.core.files.storage import default_storage
+from PIL import Image
+
+
+def image_size(name):
+    """(ширина, высота) картинки из хранилища; читается только заголовок."""
+    try:
+        with default_storage.open(name) as image_file:
+            return Image.open(image_file).size
+    except (OSError, ValueError):
+        return None
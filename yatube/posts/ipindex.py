@@ -0,0 +1,150 @@
+import csv
+import ipaddress
+import os
+
+import numpy as np
+
+UNKNOWN = np.iinfo(np.int16).min
+IPV4_MAPPED = 0xFFFF00000000
+IPV4_MAX = 0xFFFFFFFF
+FILES = ('v4_start', 'v4_offset', 'v6_hi', 'v6_lo', 'v6_offset')
+V6_KEY = np.dtype([('hi', np.uint64), ('lo', np.uint64)])
+
+
+def parse_offset(value):
+    """'+03:00' -> 180, '-' -> UNKNOWN."""
+    try:
+        sign = -1 if value[0] == '-' else 1
+        hours, minutes = value[1:].split(':')
+        return sign * (int(hours) * 60 + int(minutes))
+    except (IndexError, ValueError):
+        return UNKNOWN
+
+
+def format_offset(minutes):
+    if minutes == UNKNOWN:
+        return None
+    sign = '-' if minutes < 0 else '+'
+    return '%s%02d:%02d' % (sign, abs(minutes) // 60, abs(minutes) % 60)
+
+
+def _merge(starts, offsets):
+    """Склеивает соседние диапазоны с одинаковым смещением."""
+    merged_starts, merged_offsets = [], []
+    for start, offset in sorted(zip(starts, offsets)):
+        if merged_offsets and merged_offsets[-1] == offset:
+            continue
+        merged_starts.append(start)
+        merged_offsets.append(offset)
+    return merged_starts, merged_offsets
+
+
+def build_from_csv(csv_path, directory):
+    """
+    Строит индекс из CSV-версии IP2Location (DB11, IPv4 или IPv6):
+    ip_from, ip_to, ..., time_zone. Диапазоны хранятся только началами,
+    поэтому поиск сводится к бинарному поиску по отсортированному массиву.
+    """
+    v4_starts, v4_offsets, v6_starts, v6_offsets = [], [], [], []
+    with open(csv_path, newline='') as source:
+        for row in csv.reader(source):
+            ip_from, ip_to, offset = int(row[0]), int(row[1]), row[-1]
+            offset = parse_offset(offset)
+            if ip_to <= IPV4_MAX:
+                v4_starts.append(ip_from)
+                v4_offsets.append(offset)
+            elif IPV4_MAPPED <= ip_from and ip_to <= IPV4_MAPPED + IPV4_MAX:
+                v4_starts.append(ip_from - IPV4_MAPPED)
+                v4_offsets.append(offset)
+            else:
+                v6_starts.append(ip_from)
+                v6_offsets.append(offset)
+    v4_starts, v4_offsets = _merge(v4_starts, v4_offsets)
+    v6_starts, v6_offsets = _merge(v6_starts, v6_offsets)
+    arrays = {
+        'v4_start': np.array(v4_starts, dtype=np.uint32),
+        'v4_offset': np.array(v4_offsets, dtype=np.int16),
+        'v6_hi': np.array([ip >> 64 for ip in v6_starts], dtype=np.uint64),
+        'v6_lo': np.array(
+            [ip & 0xFFFFFFFFFFFFFFFF for ip in v6_starts], dtype=np.uint64),
+        'v6_offset': np.array(v6_offsets, dtype=np.int16),
+    }
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, name + '.npy'), array)
+    return len(v4_starts), len(v6_starts)
+
+
+class IPRangeIndex:
+    """Отсортированные начала диапазонов и смещения UTC в минутах."""
+
+    def __init__(self, v4_start, v4_offset, v6_hi, v6_lo, v6_offset):
+        self.v4_start = v4_start
+        self.v4_offset = v4_offset
+        self.v6_hi = v6_hi
+        self.v6_lo = v6_lo
+        self.v6_offset = v6_offset
+        self.v6_start = np.empty(len(v6_hi), dtype=V6_KEY)
+        self.v6_start['hi'] = v6_hi
+        self.v6_start['lo'] = v6_lo
+
+    @classmethod
+    def load(cls, directory):
+        return cls(*(
+            np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+            for name in FILES
+        ))
+
+    @staticmethod
+    def exists(directory):
+        return all(
+            os.path.isfile(os.path.join(directory, name + '.npy'))
+            for name in FILES
+        )
+
+    def lookup_v4(self, numbers):
+        numbers = np.asarray(numbers, dtype=np.uint32)
+        result = np.full(numbers.shape, UNKNOWN, dtype=np.int16)
+        idx = np.searchsorted(self.v4_start, numbers, side='right') - 1
+        found = idx >= 0
+        result[found] = self.v4_offset[idx[found]]
+        return result
+
+    def lookup_v6(self, numbers):
+        # Адрес — пара (старшие, младшие 64 бита); структурный dtype
+        # сравнивается по полям по порядку, так что один searchsorted
+        # ищет сразу всю пачку в лексикографическом порядке.
+        numbers = np.array(numbers, dtype=object)
+        keys = np.empty(numbers.shape, dtype=V6_KEY)
+        keys['hi'] = (numbers >> 64).astype(np.uint64)
+        keys['lo'] = (numbers & 0xFFFFFFFFFFFFFFFF).astype(np.uint64)
+        result = np.full(keys.shape, UNKNOWN, dtype=np.int16)
+        idx = np.searchsorted(self.v6_start, keys, side='right') - 1
+        found = idx >= 0
+        result[found] = self.v6_offset[idx[found]]
+        return result
+
+    def lookup(self, ips):
+        """Смещения вида '+03:00' (или None) для списка адресов."""
+        offsets = [None] * len(ips)
+        v4_pos, v4_num, v6_pos, v6_num = [], [], [], []
+        for pos, ip in enumerate(ips):
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                continue
+            if address.version == 6 and address.ipv4_mapped is not None:
+                address = address.ipv4_mapped
+            if address.version == 4:
+                v4_pos.append(pos)
+                v4_num.append(int(address))
+            else:
+                v6_pos.append(pos)
+                v6_num.append(int(address))
+        if v4_pos:
+            for pos, minutes in zip(v4_pos, self.lookup_v4(v4_num)):
+                offsets[pos] = format_offset(int(minutes))
+        if v6_pos:
+            for pos, minutes in zip(v6_pos, self.lookup_v6(v6_num)):
+                offsets[pos] = format_offset(int(minutes))
+        return offsets
@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.surrogate import purge, surrogate_key
+from posts.images import image_size
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры картинок у постов, загруженных до их учёта'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+
+    def handle(self, *args, **options):
+        images = dict(
+            Post.objects.exclude(image='')
+            .filter(image_width__isnull=True)
+            .values_list('id', 'image')
+        )
+        with ThreadPoolExecutor(options['workers']) as pool:
+            sizes = dict(zip(images, pool.map(image_size, images.values())))
+        updated = 0
+        with transaction.atomic():
+            for pk, size in sizes.items():
+                if size is None:
+                    self.stderr.write(f'Не удалось прочитать {images[pk]}')
+                    continue
+                Post.objects.filter(pk=pk).update(
+                    image_width=size[0], image_height=size[1])
+                purge(surrogate_key('post', pk))
+                updated += 1
+        self.stdout.write(f'Обновлено постов: {updated}')
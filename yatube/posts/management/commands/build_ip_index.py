@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.ipindex import build_from_csv
+
+
+class Command(BaseCommand):
+    help = ('Собирает индекс IP-диапазонов и часовых поясов из CSV-версии '
+            'IP2Location LITE DB11')
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--output', default=settings.IP_INDEX_DIR)
+
+    def handle(self, *args, **options):
+        v4_count, v6_count = build_from_csv(
+            options['csv_path'], options['output'])
+        self.stdout.write(
+            f'Диапазонов IPv4: {v4_count}, IPv6: {v6_count}')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь миниатюры постов, у которых они ещё не готовы'
+
+    def handle(self, *args, **options):
+        images = (
+            Post.objects.exclude(image='')
+            .filter(thumbnails_ready=False)
+            .values_list('id', 'image')
+        )
+        count = 0
+        for pk, name in images:
+            generate_thumbnails.delay(pk, name)
+            count += 1
+        self.stdout.write(f'Поставлено в очередь: {count}')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import rebuild_post_counters
+from posts.models import Comment, Like, Post
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики лайков и комментариев у постов'
+
+    def handle(self, *args, **options):
+        updated = rebuild_post_counters(Post, Like, Comment)
+        self.stdout.write(f'Пересчитано постов: {updated}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов'
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError('Полнотекстовый индекс есть только для SQLite')
+        indexed = search.rebuild()
+        self.stdout.write(f'Проиндексировано постов: {indexed}')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import User
+from posts.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает статистику пользователей для профилей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        updated = reconcile(users)
+        self.stdout.write(f'Пересчитано пользователей: {updated}')
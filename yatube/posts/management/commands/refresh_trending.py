@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+from posts.models import Comment, Like, Post
+
+
+class Command(BaseCommand):
+    help = ('Обновляет список популярных постов; запускается '
+            'периодически, например из cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Сначала пересчитать оценки всех постов, например после '
+                 'смены весов или периода полураспада',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            scored = trending.rebuild_scores(Post, Like, Comment)
+            self.stdout.write(f'Пересчитано оценок: {scored}')
+        trending.refresh()
+        self.stdout.write(
+            f'Популярных постов: {len(trending.trending_ids())}')
@@ -0,0 +1,66 @@
+import pytz
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .geoip import get_locator
+from .models import Profile
+from .utils import TZ_OFFSET_TO_NAME, get_client_ip, set_cookie
+
+
+DEFAULT_TIMEZONE = 'Etc/GMT'
+
+
+def preference_key(user_id):
+    return f'user_timezone:{user_id}'
+
+
+def get_user_timezone(user):
+    """Часовой пояс из профиля, '' если не задан."""
+    if not user.is_authenticated:
+        return ''
+    key = preference_key(user.id)
+    name = cache.get(key)
+    if name is None:
+        name = Profile.objects.filter(user=user).values_list(
+            'timezone', flat=True).first() or ''
+        cache.set(key, name, None)
+    return name
+
+
+def get_timezone(name):
+    try:
+        return pytz.timezone(name)
+    except pytz.UnknownTimeZoneError:
+        return None
+
+
+class TimezoneMiddleware:
+    """
+    Определяет часовой пояс один раз на запрос: настройка пользователя,
+    затем cookie (если IP не сменился), затем поиск по IP.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        ip = get_client_ip(request)
+        set_cookies = False
+        name = get_user_timezone(request.user)
+        tz = get_timezone(name) if name else None
+        if tz is None and request.COOKIES.get('ip') == ip:
+            tz = get_timezone(request.COOKIES.get('timezone', ''))
+        if tz is None:
+            offset = get_locator().get_offset(ip)
+            tz = pytz.timezone(TZ_OFFSET_TO_NAME.get(offset, DEFAULT_TIMEZONE))
+            set_cookies = True
+        timezone.activate(tz)
+        try:
+            response = self.get_response(request)
+        finally:
+            timezone.deactivate()
+        if set_cookies:
+            set_cookie(response, 'timezone', tz.zone)
+            set_cookie(response, 'ip', ip)
+        return response
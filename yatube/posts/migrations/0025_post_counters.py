@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:55
+
+from django.db import migrations, models
+
+from posts.counters import rebuild_post_counters
+
+
+def fill_counters(apps, schema_editor):
+    rebuild_post_counters(
+        apps.get_model('posts', 'Post'),
+        apps.get_model('posts', 'Like'),
+        apps.get_model('posts', 'Comment'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_feed_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментарии'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Лайки'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0026_user_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='profile', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('timezone', models.CharField(blank=True, help_text='Оставьте пустым для определения по IP', max_length=64, verbose_name='Часовой пояс')),
+            ],
+        ),
+    ]
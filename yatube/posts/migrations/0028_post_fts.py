@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:20
+
+from django.db import migrations
+
+from posts.search import create_index, drop_index, fill_index
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    with schema_editor.connection.cursor() as cursor:
+        create_index(cursor)
+        fill_index(cursor, Post.objects.values_list('id', 'text').iterator())
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        drop_index(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0027_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:08
+
+from django.db import migrations, models
+
+
+def mark_existing(apps, schema_editor):
+    # У старых постов миниатюры создаются при первой отрисовке, как раньше.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.exclude(image='').update(thumbnails_ready=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0029_post_image_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:21
+
+import datetime
+import math
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия оценки из posts.trending с настройками на момент миграции:
+# её поведение не должно меняться вместе с живым кодом.
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+LIKE_WEIGHT = 1
+COMMENT_WEIGHT = 3
+DECAY_TIME = 60 * 60 * 12 / math.log(2)
+
+
+def event_score(weight, when):
+    return math.log(weight) + (when - EPOCH).total_seconds() / DECAY_TIME
+
+
+def log_add(a, b):
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def fill_scores(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    scores = {}
+    for model_name, weight in (('Like', LIKE_WEIGHT),
+                               ('Comment', COMMENT_WEIGHT)):
+        model = apps.get_model('posts', model_name)
+        for post_id, created in model.objects.values_list(
+                'post_id', 'created').iterator():
+            scores[post_id] = log_add(
+                scores.get(post_id), event_score(weight, created))
+    for post_id, score in scores.items():
+        Post.objects.filter(pk=post_id).update(trending_score=score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0031_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='posts.Post')),
+                ('rank', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ('rank',),
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='post_trending_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
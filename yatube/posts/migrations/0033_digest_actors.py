@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_actors(apps, schema_editor):
+    # Из прежних уведомлений известен только последний автор.
+    Digest = apps.get_model('posts', 'Digest')
+    DigestActor = apps.get_model('posts', 'DigestActor')
+    DigestActor.objects.bulk_create(
+        DigestActor(digest_id=digest_id, actor_id=actor_id)
+        for digest_id, actor_id in Digest.objects.filter(
+            read=False).values_list('id', 'last_actor_id').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0032_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestActor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('digest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actors', to='posts.Digest')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='digestactor',
+            constraint=models.UniqueConstraint(fields=('digest', 'actor'), name='only_one_digest_actor'),
+        ),
+        migrations.RunPython(fill_actors, migrations.RunPython.noop),
+    ]
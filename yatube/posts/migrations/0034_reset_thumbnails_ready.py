@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:05
+
+from django.db import migrations
+
+
+def reset_ready(apps, schema_editor):
+    # У старых постов нет WebP и новых размеров: без сброса sorl создавал
+    # бы их при первой отрисовке прямо в запросе. До готовности миниатюр
+    # показывается исходная картинка; их ставит в очередь
+    # manage.py pregenerate_thumbnails.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.exclude(image='').update(thumbnails_ready=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0033_digest_actors'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_ready, migrations.RunPython.noop),
+    ]
@@ -66,12 +66,57 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # Размеры заполняются при загрузке картинки, чтобы при отрисовке
+    # ленты не открывать файл ради ориентации.
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    # Пока миниатюры генерируются в фоне, шаблоны показывают оригинал.
+    thumbnails_ready = models.BooleanField(default=False, editable=False)
+    likes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Лайки',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментарии',
+    )
+    # Логарифм суммы затухающих во времени весов лайков и комментариев,
+    # см. posts.trending. Пусто, пока у поста нет ни того, ни другого.
+    trending_score = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    @property
+    def is_portrait(self):
+        return bool(self.image_width and self.image_height
+                    and self.image_width < self.image_height)
+
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+            models.Index(fields=['-trending_score', '-id'],
+                         name='post_trending_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -105,6 +150,10 @@ class Follow(models.Model):
     created = models.DateTimeField(
         auto_now_add=True,
     )
+    pull = models.BooleanField(
+        default=False,
+        help_text='Посты автора читаются напрямую, а не из ленты',
+    )
 
     class Meta:
         constraints = [
@@ -135,3 +184,166 @@ class Like(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'post'], name='only_one_like'),
         ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='only_one_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_entry_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_entry_author_idx'),
+        ]
+
+
+class TrendingPost(models.Model):
+    """Готовый список популярных постов, обновляется manage.py
+    refresh_trending."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+    )
+    rank = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ('rank',)
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    followings_count = models.PositiveIntegerField(default=0)
+    groups_count = models.PositiveIntegerField(default=0)
+    unread_notifications = models.PositiveIntegerField(default=0)
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile',
+    )
+    timezone = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Часовой пояс',
+        help_text='Оставьте пустым для определения по IP',
+    )
+
+
+class Event(models.Model):
+    """Запись журнала уведомлений; воркер сворачивает их в Digest."""
+    FOLLOW = 'f'
+    LIKE = 'l'
+    COMMENT = 'c'
+    KINDS = (
+        (FOLLOW, 'follow'),
+        (LIKE, 'like'),
+        (COMMENT, 'comment'),
+    )
+    kind = models.CharField(max_length=1, choices=KINDS)
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class Digest(models.Model):
+    """Уведомление: однотипные события по одному посту, пока не прочитано."""
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='digests',
+    )
+    kind = models.CharField(max_length=1, choices=Event.KINDS)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    last_actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    count = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField()
+    read = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ('-updated', '-id')
+        indexes = [
+            models.Index(fields=['recipient', '-updated', '-id'],
+                         name='digest_recipient_idx'),
+        ]
+
+    @property
+    def others(self):
+        return self.count - 1
+
+
+class DigestActor(models.Model):
+    """Кто уже учтён в уведомлении: повтор не увеличивает счётчик."""
+    digest = models.ForeignKey(
+        Digest,
+        on_delete=models.CASCADE,
+        related_name='actors',
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['digest', 'actor'], name='only_one_digest_actor'),
+        ]
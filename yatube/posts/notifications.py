@@ -0,0 +1,98 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from core.tasks import task
+
+from . import stats
+from .models import Digest, DigestActor, Event, UserStats
+
+
+def record(kind, actor_id, recipient_id, post_id=None):
+    """
+    Дописывает событие в журнал. Сворачивает журнал отложенная задача:
+    пока она ждёт, новые события не ставят ещё одну, а копятся к ней.
+    """
+    if actor_id == recipient_id:
+        return
+    Event.objects.create(
+        kind=kind, actor_id=actor_id, recipient_id=recipient_id,
+        post_id=post_id,
+    )
+    fold_events.schedule(settings.NOTIFICATION_DELAY)
+
+
+def fold(events):
+    """
+    Сворачивает пачку событий: события одного вида по одному посту
+    добавляются к непрочитанному уведомлению получателя или заводят
+    новое. Каждый автор считается в уведомлении один раз, в какой бы
+    пачке ни пришли его повторы.
+    """
+    groups = {}
+    for event in events:
+        actors = groups.setdefault(
+            (event.recipient_id, event.kind, event.post_id), {})
+        actors.pop(event.actor_id, None)
+        actors[event.actor_id] = event.created
+    unread = Counter()
+    for (recipient_id, kind, post_id), actors in groups.items():
+        last_actor_id, updated = list(actors.items())[-1]
+        digest = Digest.objects.filter(
+            recipient_id=recipient_id, kind=kind, post_id=post_id,
+            read=False).first()
+        if digest is None:
+            digest = Digest.objects.create(
+                recipient_id=recipient_id, kind=kind, post_id=post_id,
+                last_actor_id=last_actor_id, count=0, updated=updated,
+            )
+            unread[recipient_id] += 1
+        new_actors = set(actors) - set(digest.actors.filter(
+            actor_id__in=actors).values_list('actor_id', flat=True))
+        DigestActor.objects.bulk_create(
+            [DigestActor(digest=digest, actor_id=actor_id)
+             for actor_id in new_actors],
+            ignore_conflicts=True,
+        )
+        Digest.objects.filter(pk=digest.pk).update(
+            count=F('count') + len(new_actors),
+            last_actor_id=last_actor_id,
+            updated=updated,
+        )
+    for recipient_id, count in unread.items():
+        stats.bump(recipient_id, unread_notifications=count)
+
+
+@task(queue='notifications', unique=True)
+def fold_events():
+    while True:
+        with transaction.atomic():
+            events = list(Event.objects.select_for_update(
+                skip_locked=True,
+            ).order_by('id')[:settings.NOTIFICATION_BATCH_SIZE])
+            if not events:
+                return
+            fold(events)
+            Event.objects.filter(
+                pk__in=[event.pk for event in events]).delete()
+
+
+def unread_count(user):
+    return UserStats.objects.filter(user=user).values_list(
+        'unread_notifications', flat=True).first() or 0
+
+
+def mark_read(user):
+    with transaction.atomic():
+        marked = Digest.objects.filter(recipient=user, read=False).update(
+            read=True)
+        if marked:
+            stats.bump(user.pk, unread_notifications=-marked)
+    return marked
+
+
+def recent(user):
+    return Digest.objects.filter(recipient=user).select_related(
+        'last_actor', 'post')
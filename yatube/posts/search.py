@@ -0,0 +1,189 @@
+import hashlib
+import re
+import threading
+from collections import deque
+
+import snowballstemmer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, router
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core import surrogate
+from core.replicas import read_from_replica
+from core.surrogate import surrogate_key
+
+from .models import Post
+
+
+FTS_TABLE = 'posts_post_fts'
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-я]')
+
+_local = threading.local()
+
+
+def _stemmers():
+    # Стеммеры snowball хранят состояние, поэтому свои на каждый поток.
+    if not hasattr(_local, 'russian'):
+        _local.russian = snowballstemmer.stemmer('russian')
+        _local.english = snowballstemmer.stemmer('english')
+    return _local.russian, _local.english
+
+
+def stem(word):
+    russian, english = _stemmers()
+    word = word.lower().replace('ё', 'е')
+    return (russian if CYRILLIC_RE.search(word) else english).stemWord(word)
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре, ё приведена к е, со снятыми
+    окончаниями: «котиков» и «котики» дают один и тот же терм."""
+    return [stem(word) for word in WORD_RE.findall(text)]
+
+
+def fts_available(using=None):
+    return (using or connection).vendor == 'sqlite'
+
+
+def create_index(cursor):
+    cursor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+        f"USING fts5(body, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_index(cursor):
+    cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def fill_index(cursor, rows):
+    """Заполняет индекс парами (id, text)."""
+    cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+        ((pk, ' '.join(tokenize(text))) for pk, text in rows),
+    )
+
+
+def index_post(post):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+            [post.pk, ' '.join(tokenize(post.text))],
+        )
+
+
+def unindex_post(post_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        create_index(cursor)
+        fill_index(cursor, Post.objects.values_list('id', 'text').iterator())
+    return Post.objects.count()
+
+
+def match_query(search_text):
+    """
+    Запрос FTS5: каждое слово — префикс основы в кавычках, слова
+    объединяются через AND. Кавычки экранируют синтаксис FTS5 в вводе.
+    """
+    terms = dict.fromkeys(tokenize(search_text))
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_ids(search_text, limit=None):
+    """id найденных постов, самые релевантные первыми."""
+    limit = limit or settings.SEARCH_MAX_RESULTS
+    # Сырой запрос сам не проходит через роутер баз.
+    using = connections[router.db_for_read(Post)]
+    if not fts_available(using):
+        return list(Post.objects.filter(
+            text__icontains=search_text,
+        ).values_list('id', flat=True)[:limit])
+    query = match_query(search_text)
+    if not query:
+        return []
+    with using.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}), rowid DESC LIMIT %s',
+            [query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def highlight(text, terms, size):
+    """
+    За один проход по словам текста двигает окно из size слов и
+    запоминает окно с наибольшим числом совпадений. Возвращает HTML:
+    совпавшие слова в <mark>, обрезанные края отмечены многоточием.
+    """
+    terms = tuple(terms)
+    window = deque(maxlen=size)
+    hits = best_hits = 0
+    best = None
+    for match in WORD_RE.finditer(text):
+        if len(window) == size and window[0][2]:
+            hits -= 1
+        hit = bool(terms) and stem(match.group()).startswith(terms)
+        window.append((match.start(), match.end(), hit))
+        hits += hit
+        if best is None or hits > best_hits:
+            best, best_hits = list(window), hits
+            if best_hits == size:
+                break
+        elif hits == best_hits and window[0] == best[0]:
+            # Окно ещё не сдвинулось: дописываем в него текст после совпадения.
+            best = list(window)
+    if not best:
+        return escape(text[:size * 10])
+    parts = ['…'] if best[0][0] > 0 else []
+    position = best[0][0]
+    for start, end, hit in best:
+        if hit:
+            parts.append(escape(text[position:start]))
+            parts.append(f'<mark>{escape(text[start:end])}</mark>')
+            position = end
+    parts.append(escape(text[position:best[-1][1]]))
+    if WORD_RE.search(text, best[-1][1]):
+        parts.append('…')
+    return mark_safe(''.join(parts))
+
+
+def snippets(posts, search_text):
+    """
+    Фрагменты с подсветкой для найденных постов. Кэшируются по основам
+    запроса и версии поста: запросы с разными формами слов и все
+    страницы популярного запроса пользуются уже посчитанным. Текст с
+    реплики может быть старше версии поста, такие фрагменты не хранятся.
+    """
+    terms = sorted(set(tokenize(search_text)))
+    digest = hashlib.md5(' '.join(terms).encode()).hexdigest()
+    versions = surrogate.versions(
+        surrogate_key('post', post.id) for post in posts)
+    keys = {
+        post.id: f'snippet:{digest}:{post.id}:'
+                 f'{versions[surrogate_key("post", post.id)]}'
+        for post in posts
+    }
+    cached = cache.get_many(keys.values())
+    fresh = {}
+    for post in posts:
+        key = keys[post.id]
+        if key not in cached:
+            cached[key] = fresh[key] = highlight(
+                post.text, terms, settings.SEARCH_SNIPPET_WORDS)
+    if fresh and not read_from_replica():
+        cache.set_many(fresh, settings.SEARCH_SNIPPET_CACHE_TIMEOUT)
+    return {post.id: mark_safe(cached[keys[post.id]]) for post in posts}
@@ -0,0 +1,208 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.images import get_image_dimensions
+from django.core.signals import request_started
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.surrogate import depends, surrogate_key
+
+from . import (autocomplete, notifications, search, stats, thumbnails,
+               timeline, trending)
+from .middleware import preference_key
+from .models import (Comment, Digest, Event, Follow, Group, Like,
+                     Membership, Post, Profile, User, UserStats)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=Group)
+def indexed_loaded(sender, instance, **kwargs):
+    autocomplete.remember(instance)
+
+
+@receiver(request_started, dispatch_uid='autocomplete_warm')
+def autocomplete_warm(sender, **kwargs):
+    # Индекс подсказок строится на первом запросе процесса, а не на
+    # первом поиске.
+    request_started.disconnect(dispatch_uid='autocomplete_warm')
+    autocomplete.get_index().refresh()
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, **kwargs):
+    cache.delete(preference_key(instance.pk))
+
+
+@receiver(pre_save, sender=Post)
+def post_image_size(sender, instance, **kwargs):
+    # Размеры берутся из только что загруженного файла, пока он в памяти;
+    # уже сохранённые картинки не открываются.
+    if not instance.image:
+        instance.image_width = instance.image_height = None
+        instance.thumbnails_ready = False
+    elif not instance.image._committed:
+        instance.image_width, instance.image_height = get_image_dimensions(
+            instance.image.file)
+        instance.thumbnails_ready = False
+        instance._new_image = True
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+    if instance.__dict__.pop('_new_image', False):
+        thumbnails.generate_thumbnails.delay(instance.pk, instance.image.name)
+    if created:
+        stats.bump(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, posts_count=-1)
+    search.unindex_post(instance.pk)
+    pulled = Follow.objects.filter(author_id=instance.author_id, pull=True)
+    if pulled.exists():
+        timeline.demote.delay(instance.author_id)
+
+
+@receiver(pre_save, sender=Follow)
+def follow_mode(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.pull = timeline.is_prolific(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    stats.bump(instance.author_id, followers_count=1)
+    stats.bump(instance.user_id, followings_count=1)
+    if not instance.pull:
+        timeline.backfill(instance)
+    notifications.record(Event.FOLLOW, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, followers_count=-1)
+    stats.bump(instance.user_id, followings_count=-1)
+    timeline.trim(instance)
+
+
+@receiver(post_save, sender=Membership)
+def membership_created(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.member_id, groups_count=1)
+
+
+@receiver(post_delete, sender=Membership)
+def membership_deleted(sender, instance, **kwargs):
+    stats.bump(instance.member_id, groups_count=-1)
+
+
+def bump_post_counter(post_id, field, delta):
+    Post.objects.filter(pk=post_id).update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        bump_post_counter(instance.post_id, 'likes_count', 1)
+        trending.add_event(
+            instance.post_id, settings.TRENDING_LIKE_WEIGHT, instance.created)
+        notifications.record(
+            Event.LIKE, instance.user_id, instance.post.author_id,
+            instance.post_id)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    bump_post_counter(instance.post_id, 'likes_count', -1)
+    trending.remove_event(
+        instance.post_id, settings.TRENDING_LIKE_WEIGHT, instance.created)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        bump_post_counter(instance.post_id, 'comments_count', 1)
+        trending.add_event(
+            instance.post_id, settings.TRENDING_COMMENT_WEIGHT,
+            instance.created)
+        notifications.record(
+            Event.COMMENT, instance.author_id, instance.post.author_id,
+            instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump_post_counter(instance.post_id, 'comments_count', -1)
+    trending.remove_event(
+        instance.post_id, settings.TRENDING_COMMENT_WEIGHT, instance.created)
+
+
+@receiver(post_delete, sender=Digest)
+def digest_deleted(sender, instance, **kwargs):
+    # Уведомления удаляются вместе с постом или автором события.
+    if not instance.read:
+        stats.bump(instance.recipient_id, unread_notifications=-1)
+
+
+# Суррогатные ключи, которые сдвигает каждая модель. Объявлены после
+# обработчиков выше: версии сдвигаются, когда счётчики уже обновлены.
+def user_keys(user, created, update_fields):
+    if update_fields == frozenset(['last_login']):
+        return []
+    keys = []
+    if not created:
+        keys.append(surrogate_key('user', user.pk))
+    if autocomplete.index_changed(user, created, update_fields):
+        keys.append(autocomplete.INDEX_KEY)
+    return keys
+
+
+def group_keys(group, created, update_fields):
+    keys = [surrogate_key('groups', 'all')]
+    if not created:
+        keys.append(surrogate_key('group', group.pk))
+    if autocomplete.index_changed(group, created, update_fields):
+        keys.append(autocomplete.INDEX_KEY)
+    return keys
+
+
+def post_keys(post, created, update_fields):
+    # Правка поста может перенести его между лентами.
+    return [surrogate_key('post', post.pk), surrogate_key('feeds', 'all')]
+
+
+def post_child_keys(instance, created, update_fields):
+    return [surrogate_key('post', instance.post_id)]
+
+
+def follow_keys(follow, created, update_fields):
+    return [surrogate_key('follows', follow.user_id)]
+
+
+def membership_keys(membership, created, update_fields):
+    # Состав и роли участников видны на странице группы и в списке групп.
+    return [surrogate_key('group', membership.group_id),
+            surrogate_key('groups', 'all')]
+
+
+depends(User, user_keys)
+depends(Group, group_keys)
+depends(Post, post_keys)
+depends(Like, post_child_keys)
+depends(Comment, post_child_keys)
+depends(Follow, follow_keys)
+depends(Membership, membership_keys)
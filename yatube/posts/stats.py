@@ -0,0 +1,26 @@
+from django.db.models import F
+
+from .counters import rebuild_user_stats
+from .models import Digest, Follow, Membership, Post, User, UserStats
+
+
+def reconcile(users):
+    return rebuild_user_stats(
+        UserStats, Post, Follow, Membership, users, Digest)
+
+
+def get_user_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        reconcile(User.objects.filter(pk=user.pk))
+        return UserStats.objects.get(user=user)
+
+
+def bump(user_id, **deltas):
+    """
+    Сдвигает счётчики пользователя. Если строки ещё нет, её создаст
+    get_user_stats при первом чтении, пересчитав всё с нуля.
+    """
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
@@ -0,0 +1,13 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    authenticated = context['request'].user.is_authenticated
+    return mark_safe(
+        '<hr />'.join(render_cards(list(posts), authenticated)))
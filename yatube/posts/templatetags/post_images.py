@@ -0,0 +1,21 @@
+import logging
+
+from django import template
+
+from posts.thumbnails import picture
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    context = {'post': post}
+    if post.thumbnails_ready:
+        try:
+            context.update(picture(post.image))
+        except Exception:
+            # Как и тег thumbnail у sorl: сбой миниатюр не ломает страницу.
+            logger.exception('Thumbnails for %s unavailable', post.image.name)
+    return context
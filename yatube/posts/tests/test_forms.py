@@ -1,14 +1,18 @@
 from http import HTTPStatus
+from io import StringIO
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Post, Group
+from posts.forms import PostForm
+from posts.models import Like, Post, Group
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -69,6 +73,24 @@ class PostFormTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.id, form_data['group'])
         self.assertTrue(post.image)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertFalse(post.is_portrait)
+
+    def test_backfill_image_sizes(self):
+        """Команда заполняет размеры картинок старых постов"""
+        post = Post.objects.create(
+            text='Старый пост',
+            author=self.user,
+            image=SimpleUploadedFile('old.gif', self.small_gif, 'image/gif'),
+        )
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None, image_height=None)
+        call_command('backfill_image_sizes', stdout=StringIO())
+        self.assertEqual(
+            Post.objects.filter(pk=post.pk).values_list(
+                'image_width', 'image_height').get(),
+            (2, 1),
+        )
 
     def test_can_edit_post(self):
         '''Проверка изменения поста после редактирования'''
@@ -97,6 +119,24 @@ class PostFormTests(TestCase):
         self.assertEqual(post.group.id, form_data['group'])
         self.assertEqual(post.image, 'posts/small.gif')
 
+    def test_edit_keeps_counters(self):
+        '''Правка поста не затирает лайки, поставленные во время неё'''
+        post = Post.objects.create(text='Тестовый текст', author=self.user)
+        liker = User.objects.create_user(username='liker')
+        is_valid = PostForm.is_valid
+
+        def like_meanwhile(form):
+            Like.objects.create(post=post, user=liker)
+            return is_valid(form)
+        with mock.patch.object(PostForm, 'is_valid', like_meanwhile):
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.id}),
+                data={'text': 'Новый тестовый текст'},
+            )
+        post = Post.objects.get(id=post.id)
+        self.assertEqual(post.text, 'Новый тестовый текст')
+        self.assertEqual(post.likes_count, 1)
+
 
 class CommentFormTests(TestCase):
     @classmethod
@@ -1,7 +1,11 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import (Comment, Follow, Group, Like, Membership, Post,
+                      UserStats)
 
 User = get_user_model()
 
@@ -55,3 +59,76 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+        )
+
+    def test_counters_follow_likes_and_comments(self):
+        """Счётчики поста меняются вместе с лайками и комментариями."""
+        like = Like.objects.create(post=self.post, user=self.user)
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 1)
+        like.delete()
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_rebuild_counters(self):
+        """rebuild_counters восстанавливает испорченные счётчики."""
+        Like.objects.create(post=self.post, user=self.user)
+        Post.objects.filter(pk=self.post.pk).update(
+            likes_count=10, comments_count=5)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 0)
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def test_stats_follow_writes(self):
+        """Статистика пользователя меняется вместе с данными."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        Membership.objects.create(group=self.group, member=self.author)
+        author_stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.groups_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).followings_count, 1)
+        post.delete()
+        follow.delete()
+        author_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+
+    def test_reconcile_stats(self):
+        """reconcile_stats восстанавливает потерянную статистику."""
+        Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).delete()
+        call_command('reconcile_stats', 'author', stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
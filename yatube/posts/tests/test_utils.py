@@ -0,0 +1,129 @@
+import csv
+import datetime
+import math
+import os
+import shutil
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from posts.geoip import TimezoneLocator
+from posts.ipindex import IPRangeIndex, build_from_csv
+from posts.trending import event_score, log_add, log_sub
+
+IPV4_MAPPED = 0xFFFF00000000
+IPV6_BASE = 0x20010DB8 << 96
+IPV6_JP = IPV6_BASE + 0xFFFFFFFFFFFF00
+IP_RANGES = (
+    (0, IPV4_MAPPED - 1, '-'),
+    (IPV4_MAPPED, IPV4_MAPPED + 16777215, '-'),
+    (IPV4_MAPPED + 16777216, IPV4_MAPPED + 16777471, '+10:00'),
+    (IPV4_MAPPED + 16777472, IPV4_MAPPED + 16778239, '+08:00'),
+    (IPV4_MAPPED + 16778240, IPV4_MAPPED + 4294967295, '+03:00'),
+    (IPV4_MAPPED + 4294967296, IPV6_BASE - 1, '-'),
+    (IPV6_BASE, IPV6_JP - 1, '+01:00'),
+    (IPV6_JP, IPV6_JP + 0xFF, '+09:00'),
+    (IPV6_JP + 0x100, 2 ** 128 - 1, '+01:00'),
+)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.calls = 0
+
+    def get_timezone(self, ip):
+        self.calls += 1
+        return '+03:00'
+
+
+class TimezoneLocatorTest(SimpleTestCase):
+    def setUp(self):
+        self.locator = TimezoneLocator('missing.bin', cache_size=2)
+        self.database = FakeDatabase()
+        self.locator._database = self.database
+        self.locator._opened = True
+
+    def test_lookup_is_cached(self):
+        """Повторный запрос того же IP не обращается к базе"""
+        for _ in range(3):
+            self.assertEqual(self.locator.get_offset('1.1.1.1'), '+03:00')
+        self.assertEqual(self.database.calls, 1)
+        self.assertEqual(
+            self.locator.stats(), {'hits': 2, 'misses': 1, 'size': 1})
+
+    def test_cache_is_bounded(self):
+        """Самый давний IP вытесняется из кэша"""
+        for ip in ('1.1.1.1', '2.2.2.2', '1.1.1.1', '3.3.3.3', '2.2.2.2'):
+            self.locator.get_offset(ip)
+        self.assertEqual(self.database.calls, 4)
+        self.assertEqual(self.locator.stats()['size'], 2)
+
+    def test_missing_database(self):
+        """Без файла базы часовой пояс не определяется"""
+        locator = TimezoneLocator('missing.bin', cache_size=2)
+        with self.assertLogs('posts.geoip', level='WARNING'):
+            self.assertIsNone(locator.get_offset('1.1.1.1'))
+
+
+class IPRangeIndexTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        csv_path = os.path.join(cls.directory, 'db11.csv')
+        with open(csv_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file, quoting=csv.QUOTE_ALL)
+            for ip_from, ip_to, offset in IP_RANGES:
+                writer.writerow(
+                    [ip_from, ip_to, '-', '-', '-', '-', 0, 0, '-', offset])
+        build_from_csv(csv_path, cls.directory)
+        cls.index = IPRangeIndex.load(cls.directory)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def test_batch_lookup(self):
+        """Индекс определяет смещения для пачки адресов"""
+        ips = ['1.0.0.1', '1.0.1.5', '8.8.8.8', '0.1.2.3', '::ffff:1.0.0.1',
+               '2001:db8::1', '2001:db8::ff:ffff:ffff:ff01',
+               '2001:db8::1:0:0:0', '2001:db8:1::', '2001::', 'abc']
+        self.assertEqual(
+            self.index.lookup(ips),
+            ['+10:00', '+08:00', '+03:00', None, '+10:00',
+             '+01:00', '+09:00', '+01:00', '+01:00', None, None],
+        )
+
+    def test_locator_uses_index(self):
+        """Определитель часового пояса предпочитает собранный индекс"""
+        locator = TimezoneLocator('missing.bin', 10, self.directory)
+        self.assertEqual(
+            locator.get_offsets(['1.0.0.1', '8.8.8.8', '1.0.0.1']),
+            ['+10:00', '+03:00', '+10:00'])
+
+
+@override_settings(TRENDING_HALF_LIFE=3600)
+class TrendingScoreTest(SimpleTestCase):
+    def test_half_life(self):
+        """Событие часом раньше весит вдвое меньше"""
+        now = datetime.datetime(2023, 5, 1, tzinfo=datetime.timezone.utc)
+        hour_ago = now - datetime.timedelta(hours=1)
+        self.assertAlmostEqual(
+            event_score(1, now) - event_score(1, hour_ago), math.log(2))
+        self.assertAlmostEqual(
+            event_score(2, hour_ago), event_score(1, now))
+
+    def test_add_and_remove(self):
+        """Снятие события возвращает прежнюю оценку"""
+        self.assertEqual(log_add(None, 5.0), 5.0)
+        self.assertAlmostEqual(log_add(0.0, 0.0), math.log(2))
+        self.assertAlmostEqual(log_sub(log_add(3.0, 1.0), 1.0), 3.0)
+        self.assertIsNone(log_sub(1.0, 1.0))
+
+    def test_weight_must_be_positive(self):
+        """Нулевой вес — ошибка настройки, а не падение math.log"""
+        now = datetime.datetime(2023, 5, 1, tzinfo=datetime.timezone.utc)
+        with self.assertRaises(ImproperlyConfigured):
+            event_score(0, now)
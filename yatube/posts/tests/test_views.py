@@ -1,15 +1,29 @@
 import shutil
 import tempfile
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+import pytz
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_started
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Post, Group, Comment, Follow
+from core import surrogate
+from core.tasks import run_pending
+from posts import autocomplete
+from posts.models import (Post, Group, Comment, Follow, Like, Profile,
+                          Digest, Membership, UserStats)
+from posts.signals import autocomplete_warm
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -17,6 +31,15 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
+def fake_srcset(image, image_format):
+    extension = image_format.lower()
+    return [
+        SimpleNamespace(
+            url=f'/cache/{width}.{extension}', width=width, height=width // 2)
+        for width in (360, 720)
+    ]
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class ViewsTests(TestCase):
     @classmethod
@@ -193,21 +216,23 @@ class ViewsTests(TestCase):
         self.assertEqual(response.context.get('comments')[0], comment)
 
     def test_cache(self):
-        """Кэш index работает корректно"""
+        """Карточки постов берутся из кэша и сбрасываются при изменениях"""
         new_post = Post.objects.create(
             text='Тестовый кэш',
             author=self.user,
         )
         response = self.authorized_client.get(reverse('posts:index'))
-        cache_post = response.context['page_obj'][0]
-        self.assertEqual(new_post, cache_post)
-        new_post.delete()
+        self.assertTemplateUsed(response, 'posts/includes/article.html')
         response = self.authorized_client.get(reverse('posts:index'))
+        self.assertTemplateNotUsed(response, 'posts/includes/article.html')
         self.assertIn(new_post.text, response.content.decode('utf-8'))
-        cache.clear()
+        new_post.text = 'Изменённый кэш'
+        new_post.save()
         response = self.authorized_client.get(reverse('posts:index'))
-        cache_post = response.context['page_obj'][0]
-        self.assertNotEqual(new_post, cache_post)
+        self.assertIn(new_post.text, response.content.decode('utf-8'))
+        new_post.delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn(new_post.text, response.content.decode('utf-8'))
 
     def test_new_post(self):
         """Новый пост появляется в follow тех, кто на него подписан"""
@@ -221,6 +246,254 @@ class ViewsTests(TestCase):
         response = self.test_client.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), 0)
 
+    def test_feed_queries_do_not_grow(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        self.authorized_client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as one_post:
+            self.authorized_client.get(reverse('posts:index'))
+        for i in range(3):
+            author = User.objects.create_user(username=f'author_{i}')
+            group = Group.objects.create(title=f'Группа {i}', slug=f'g-{i}')
+            post = Post.objects.create(author=author, group=group, text='Тест')
+            Like.objects.create(post=post, user=self.user)
+        with CaptureQueriesContext(connection) as many_posts:
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(
+            len(one_post.captured_queries), len(many_posts.captured_queries))
+        self.assertTrue(response.context['page_obj'][0].is_liked)
+
+    def test_guest_cards_without_like_button(self):
+        """Гостю кнопка лайка в карточке не показывается"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'data-like-url')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'type="button"')
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'data-like-url')
+
+    def test_unfollow_trims_feed(self):
+        """После отписки посты автора пропадают из follow"""
+        test_author = User.objects.create_user(username='Following')
+        post = Post.objects.create(author=test_author, text='Тест подписки')
+        follow = Follow.objects.create(user=self.user, author=test_author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(post, response.context['page_obj'][0])
+        follow.delete()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(FEED_PULL_THRESHOLD=1)
+    def test_prolific_author_feed(self):
+        """Посты плодовитого автора попадают в follow без раскладки"""
+        test_author = User.objects.create_user(username='Following')
+        Post.objects.create(author=test_author, text='Старый пост')
+        follow = Follow.objects.create(user=self.user, author=test_author)
+        self.assertTrue(follow.pull)
+        post = Post.objects.create(author=test_author, text='Новый пост')
+        self.assertFalse(self.user.feed_entries.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(post, response.context['page_obj'][0])
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    @override_settings(FEED_PULL_THRESHOLD=3, POSTS_VIEW_NUM=2)
+    def test_prolific_author_merged_feed(self):
+        """Лента из раскладки и постов автора листается одним ключом"""
+        regular = User.objects.create_user(username='regular')
+        prolific = User.objects.create_user(username='prolific')
+        for i in range(3):
+            Post.objects.create(author=prolific, text=f'Плодовитый {i}')
+        Follow.objects.create(user=self.user, author=regular)
+        follow = Follow.objects.create(user=self.user, author=prolific)
+        self.assertTrue(follow.pull)
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate((regular, prolific, regular))
+        ]
+        expected = list(Post.objects.filter(
+            author__in=(regular, prolific)).order_by('-pub_date', '-id'))
+        url = reverse('posts:follow_index')
+        seen = []
+        response = self.authorized_client.get(url)
+        while True:
+            page_obj = response.context['page_obj']
+            seen += list(page_obj)
+            if page_obj.next_cursor is None:
+                break
+            response = self.authorized_client.get(
+                url, {'cursor': page_obj.next_cursor})
+        self.assertEqual(seen, expected)
+        posts[1].delete()
+        Post.objects.filter(author=prolific).first().delete()
+        run_pending()
+        follow.refresh_from_db()
+        self.assertFalse(follow.pull)
+        self.assertEqual(
+            self.user.feed_entries.filter(author=prolific).count(), 2)
+
+    def test_timezone_cookie(self):
+        """Часовой пояс определяется на любой странице"""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        self.assertEqual(response.cookies['timezone'].value, 'Etc/GMT')
+        self.assertEqual(response.cookies['ip'].value, '127.0.0.1')
+        self.client.cookies['timezone'] = 'Asia/Tokyo'
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('timezone', response.cookies)
+        self.assertContains(
+            response, self.post.pub_date.astimezone(
+                pytz.timezone('Asia/Tokyo')).strftime('%H:%M'))
+
+    def test_timezone_preference(self):
+        """Настройка пользователя важнее cookie"""
+        self.authorized_client.post(
+            reverse('posts:profile_edit', args=(self.user.username,)),
+            {'timezone': 'America/New_York'},
+        )
+        self.assertEqual(
+            Profile.objects.get(user=self.user).timezone, 'America/New_York')
+        self.authorized_client.cookies['timezone'] = 'Asia/Tokyo'
+        self.authorized_client.cookies['ip'] = '127.0.0.1'
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        self.assertContains(
+            response, self.post.pub_date.astimezone(
+                pytz.timezone('America/New_York')).strftime('%H:%M'))
+
+    def test_thumbnails_fallback(self):
+        """До готовности миниатюр показывается оригинал картинки"""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        self.assertFalse(self.post.thumbnails_ready)
+        self.assertContains(self.client.get(url), self.post.image.url)
+        with mock.patch('posts.thumbnails.render_variants') as render:
+            call_command('run_tasks', workers=0, once=True, stdout=StringIO())
+        render.assert_called_once_with(self.post.image.name)
+        self.assertTrue(
+            Post.objects.filter(pk=self.post.pk, thumbnails_ready=True)
+            .exists())
+        with mock.patch('posts.thumbnails.srcset', side_effect=fake_srcset):
+            response = self.client.get(url)
+        self.assertNotContains(response, self.post.image.url)
+        self.assertContains(
+            response,
+            '<source type="image/webp" srcset="/cache/360.webp 360w, '
+            '/cache/720.webp 720w"')
+        self.assertContains(
+            response, 'src="/cache/720.jpeg" srcset="/cache/360.jpeg 360w, '
+            '/cache/720.jpeg 720w"')
+        self.assertContains(response, 'width="720" height="360"')
+
+    def test_like_toggle(self):
+        """Лайк ставится и снимается POST-запросом, ответ — JSON"""
+        like = reverse('posts:post_like', args=(self.post.id,))
+        dislike = reverse('posts:post_dislike', args=(self.post.id,))
+        self.assertEqual(self.authorized_client.get(like).status_code, 405)
+        for url, liked, count in ((like, True, 1), (like, True, 1),
+                                  (dislike, False, 0), (dislike, False, 0)):
+            response = self.authorized_client.post(
+                url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            self.assertEqual(
+                response.json(), {'liked': liked, 'likes_count': count})
+        response = self.authorized_client.post(like)
+        self.assertRedirects(
+            response, reverse('posts:post_detail', args=(self.post.id,)))
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+
+    def test_trending(self):
+        """Популярное отдаётся из списка, собранного командой"""
+        quiet = Post.objects.create(author=self.user, text='Тихий пост')
+        loud = Post.objects.create(author=self.user, text='Громкий пост')
+        fans = [User.objects.create_user(username=f'fan_{i}')
+                for i in range(2)]
+        Like.objects.create(post=quiet, user=fans[0])
+        for fan in fans:
+            Like.objects.create(post=loud, user=fan)
+        Comment.objects.create(post=loud, author=fans[0], text='Ого')
+        url = reverse('posts:trending')
+        self.assertEqual(len(self.client.get(url).context['page_obj']), 0)
+        call_command('refresh_trending', stdout=StringIO())
+        response = self.client.get(url)
+        self.assertEqual(list(response.context['page_obj']), [loud, quiet])
+        Like.objects.filter(post=quiet).delete()
+        self.assertIsNone(Post.objects.get(pk=quiet.pk).trending_score)
+
+    def test_conditional_pages(self):
+        """Неизменившаяся страница отдаётся ответом 304 без шаблона"""
+        fan = User.objects.create_user(username='fan')
+        pages = {
+            reverse('posts:post_detail', args=(self.post.id,)):
+                lambda: Like.objects.create(post=self.post, user=fan),
+            reverse('posts:profile', args=(self.user.username,)):
+                lambda: Follow.objects.create(user=fan, author=self.user),
+            reverse('posts:group_posts', args=(self.group.slug,)):
+                lambda: Membership.objects.create(
+                    group=self.group, member=fan),
+            reverse('posts:groups_list'):
+                lambda: Group.objects.create(title='Новая', slug='new'),
+        }
+        for url, change in pages.items():
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                change()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_not_modified_skips_posts(self):
+        """Для ответа 304 посты ленты целиком не загружаются"""
+        for url in (reverse('posts:profile', args=(self.user.username,)),
+                    reverse('posts:group_posts', args=(self.group.slug,))):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertIn(self.post, response.context['page_obj'])
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(any(
+                    '"posts_post"."text"' in query['sql']
+                    for query in queries.captured_queries))
+
+    def test_commenter_rename_changes_etag(self):
+        """Переименование комментатора меняет ETag страницы поста"""
+        commenter = User.objects.create_user(username='commenter')
+        Comment.objects.create(
+            post=self.post, author=commenter, text='Комментарий')
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        etag = self.client.get(url)['ETag']
+        commenter.username = 'renamed'
+        commenter.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'renamed')
+
+    def test_relogin_changes_etag(self):
+        """После нового входа страница не отдаётся 304 со старым csrf"""
+        User.objects.create_user(username='reader', password='password')
+        credentials = {'username': 'reader', 'password': 'password'}
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        self.client.post(reverse('users:login'), credentials)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.post(reverse('users:logout'))
+        self.client.post(reverse('users:login'), credentials)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_groups_fragment_invalidation(self):
+        """Кэшированный список групп обновляется после правки группы"""
+        url = reverse('posts:groups_list')
+        self.assertContains(self.client.get(url), self.group.title)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Переименованная группа'
+        group.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Переименованная группа')
+        self.assertEqual(response['Surrogate-Key'], 'groups:all')
+
     def test_sub(self):
         """Пользователь может управлять подписками"""
         test_author = User.objects.create_user(username='Following')
@@ -343,3 +616,232 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj']),
                     1
                 )
+
+    def test_cursor_pages(self):
+        """Курсорная пагинация переходит вперёд и назад по ленте"""
+        response = self.client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        response = self.client.get(
+            reverse('posts:index') + f'?cursor={first_page.next_cursor}')
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 1)
+        self.assertEqual(second_page[0].text, 'Тест 0')
+        self.assertFalse(second_page.has_next())
+        response = self.client.get(
+            reverse('posts:index')
+            + f'?cursor={second_page.previous_cursor}')
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page))
+
+    def test_broken_cursor(self):
+        """Испорченный курсор открывает первую страницу"""
+        # Второй — дата за пределами datetime.
+        for cursor in ('abc', 'bi45OTk5OTk5OTk5OTk5OTk5OTk5OS4x'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse('posts:index') + f'?cursor={cursor}')
+                self.assertEqual(
+                    len(response.context['page_obj']), settings.POSTS_VIEW_NUM)
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_author')
+        cls.cats = Post.objects.create(
+            text='Котики гуляют по крыше', author=cls.user)
+        cls.dogs = Post.objects.create(
+            text='Про собак и одного котика', author=cls.user)
+        Post.objects.create(text='Ничего общего', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, search_text):
+        response = self.client.get(
+            reverse('posts:post_search'), {'search_text': search_text})
+        return list(response.context['page_obj'])
+
+    def test_search_stems_words(self):
+        """Поиск находит другие формы слова, лучшие совпадения первыми"""
+        self.assertEqual(self.search('котиков'), [self.cats, self.dogs])
+        self.assertEqual(self.search('котик собаки'), [self.dogs])
+        self.assertEqual(self.search('"*)('), [])
+
+    def test_search_index_follows_posts(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = Post.objects.get(pk=self.cats.pk)
+        post.text = 'Кошки спят'
+        post.save()
+        self.assertEqual(self.search('котики'), [self.dogs])
+        self.assertEqual(self.search('кошка'), [self.cats])
+        Post.objects.get(pk=self.dogs.pk).delete()
+        self.assertEqual(self.search('котики'), [])
+
+    def test_search_snippets(self):
+        """Найденные слова подсвечены, фрагмент пересчитывается по версии"""
+        response = self.client.get(
+            reverse('posts:post_search'), {'search_text': 'котиков'})
+        self.assertContains(response, '<mark>Котики</mark> гуляют')
+        with mock.patch('posts.search.highlight') as highlight:
+            self.search('котики')
+        highlight.assert_not_called()
+        post = Post.objects.get(pk=self.cats.pk)
+        post.text = 'Котики спят'
+        post.save()
+        response = self.client.get(
+            reverse('posts:post_search'), {'search_text': 'котик'})
+        self.assertContains(response, '<mark>Котики</mark> спят')
+        self.assertNotContains(response, 'гуляют')
+
+    def test_rebuild_search_index(self):
+        """Команда пересобирает индекс по таблице постов"""
+        Post.objects.filter(pk=self.cats.pk).update(text='Лисы')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('лиса'), [self.cats])
+
+
+class SuggestViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Любители львов', slug='lions', description='Тест')
+
+    def setUp(self):
+        autocomplete.reset_index()
+
+    def suggest(self, q):
+        response = self.client.get(reverse('posts:suggest'), {'q': q})
+        return [item['value'] for item in response.json()['results']]
+
+    def test_suggest_prefixes(self):
+        """Подсказки по началу имени, фамилии, ника и названия группы"""
+        self.assertEqual(self.suggest('тол'), ['leo'])
+        self.assertEqual(self.suggest('Ль'), ['lions'])
+        self.assertEqual(sorted(self.suggest('l')), ['leo', 'lions'])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_suggest_without_queries(self):
+        """Индекс перестраивается по версиям, иначе в базу не ходит"""
+        self.suggest('л')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('lio'), ['lions'])
+        Group.objects.create(title='Лесники', slug='wood', description='')
+        self.group.delete()
+        self.assertEqual(self.suggest('лес'), ['wood'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('lio'), [])
+
+    def test_changes_from_other_processes(self):
+        """Правки в обход сигналов видны после сдвига версии"""
+        self.suggest('л')
+        User.objects.filter(pk=self.user.pk).update(username='lev')
+        self.assertEqual(self.suggest('lev'), [])
+        surrogate.purge(autocomplete.INDEX_KEY)
+        self.assertEqual(self.suggest('lev'), ['lev'])
+
+    def test_only_name_changes_rebuild(self):
+        """Правка полей, по которым не ищут, индекс не перестраивает"""
+        self.suggest('л')
+        user = User.objects.get(pk=self.user.pk)
+        user.email = 'leo@example.com'
+        user.save()
+        Membership.objects.create(group=self.group, member=user)
+        with self.assertNumQueries(0):
+            self.suggest('л')
+        user.last_name = 'Николаевич'
+        user.save()
+        self.assertEqual(self.suggest('никол'), ['leo'])
+
+    def test_index_is_warmed_by_first_request(self):
+        """Индекс строится на первом запросе, а не на первом поиске"""
+        request_started.connect(
+            autocomplete_warm, dispatch_uid='autocomplete_warm')
+        self.client.get(reverse('about:author'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('тол'), ['leo'])
+
+
+@override_settings(NOTIFICATION_DELAY=0)
+class NotificationsViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.fans = [
+            User.objects.create_user(username=f'fan_{i}') for i in range(3)]
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def fold(self):
+        call_command('run_tasks', workers=0, once=True, stdout=StringIO())
+
+    def test_events_fold_into_digests(self):
+        """Лайки одного поста сворачиваются в одно уведомление"""
+        for fan in self.fans:
+            Like.objects.create(post=self.post, user=fan)
+        Follow.objects.create(user=self.fans[0], author=self.author)
+        Comment.objects.create(post=self.post, author=self.author, text='Я')
+        self.fold()
+        likes = Digest.objects.get(recipient=self.author, kind='l')
+        self.assertEqual(likes.count, 3)
+        self.assertEqual(likes.last_actor, self.fans[-1])
+        self.assertEqual(Digest.objects.count(), 2)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, '<span class="badge bg-danger">2</span>')
+        response = self.client.get(reverse('posts:notifications'))
+        self.assertContains(response, 'и ещё 2')
+        self.assertFalse(response.context['page_obj'][0].read)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'badge bg-danger')
+
+    def test_repeat_actor_across_folds(self):
+        """Повтор автора в следующей пачке не увеличивает счётчик"""
+        like = Like.objects.create(post=self.post, user=self.fans[0])
+        self.fold()
+        like.delete()
+        Like.objects.create(post=self.post, user=self.fans[0])
+        Like.objects.create(post=self.post, user=self.fans[1])
+        self.fold()
+        self.assertEqual(Digest.objects.get().count, 2)
+
+    def test_rebuild_unread_count(self):
+        """reconcile_stats восстанавливает число непрочитанных"""
+        Like.objects.create(post=self.post, user=self.fans[0])
+        self.fold()
+        UserStats.objects.filter(user=self.author).update(
+            unread_notifications=7)
+        call_command('reconcile_stats', stdout=StringIO())
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).stats.unread_notifications, 1)
+
+    def test_deleted_post_clears_unread(self):
+        """Удаление поста снимает его непрочитанные уведомления"""
+        Like.objects.create(post=self.post, user=self.fans[0])
+        self.fold()
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertFalse(Digest.objects.exists())
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).stats.unread_notifications, 0)
+
+    def test_read_digest_is_not_reused(self):
+        """После прочтения новое событие заводит новое уведомление"""
+        Like.objects.create(post=self.post, user=self.fans[0])
+        self.fold()
+        self.client.get(reverse('posts:notifications'))
+        Like.objects.create(post=self.post, user=self.fans[1])
+        self.fold()
+        self.assertEqual(
+            list(Digest.objects.values_list('count', 'read')),
+            [(1, False), (1, True)],
+        )
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).stats.unread_notifications, 1)
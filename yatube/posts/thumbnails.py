@@ -0,0 +1,76 @@
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from core.surrogate import purge, surrogate_key
+from core.tasks import task
+from .models import Post
+
+
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+
+def variants(image_format):
+    """(геометрия, опции) миниатюр формата: картинка вписывается в
+    квадрат каждого размера и не увеличивается."""
+    for size in settings.THUMBNAIL_SIZES:
+        yield f'{size}x{size}', {'format': image_format, 'upscale': False}
+
+
+def render_variants(name):
+    """Создаёт все варианты миниатюр картинки."""
+    for image_format in settings.THUMBNAIL_FORMATS:
+        for geometry, options in variants(image_format):
+            get_thumbnail(name, geometry, **options)
+    return name
+
+
+def srcset(image, image_format):
+    """Готовые миниатюры формата, по возрастанию ширины без повторов."""
+    thumbnails = {}
+    for geometry, options in variants(image_format):
+        thumbnail = get_thumbnail(image, geometry, **options)
+        thumbnails.setdefault(thumbnail.width, thumbnail)
+    return [thumbnails[width] for width in sorted(thumbnails)]
+
+
+def picture(image):
+    """
+    Источники для <picture>: по srcset на каждый формат, последний формат
+    идёт в сам <img>. Размеры <img> берутся у варианта для показа.
+    Миниатюры уже лежат в хранилище, sorl отдаёт их из своего kvstore.
+    """
+    sources = []
+    for image_format in settings.THUMBNAIL_FORMATS:
+        thumbnails = srcset(image, image_format)
+        sources.append({
+            'type': MIME_TYPES[image_format],
+            'srcset': ', '.join(
+                f'{thumbnail.url} {thumbnail.width}w'
+                for thumbnail in thumbnails),
+            'thumbnails': thumbnails,
+        })
+    fallback = sources.pop()
+    shown = [
+        thumbnail for thumbnail in fallback['thumbnails']
+        if max(thumbnail.width, thumbnail.height)
+        <= settings.THUMBNAIL_DISPLAY_SIZE
+    ] or fallback['thumbnails'][:1]
+    return {'sources': sources, 'fallback': fallback, 'img': shown[-1]}
+
+
+def mark_ready(post_id, name):
+    # Картинку могли заменить, пока шла генерация: тогда ждём её задачу.
+    if Post.objects.filter(pk=post_id, image=name).update(
+            thumbnails_ready=True):
+        purge(surrogate_key('post', post_id))
+
+
+@task(queue='thumbnails')
+def generate_thumbnails(post_id, name):
+    """Фоновая задача: миниатюры новой картинки поста."""
+    render_variants(name)
+    mark_ready(post_id, name)
@@ -0,0 +1,130 @@
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import F
+
+from core.tasks import task
+
+from .feeds import posts_loader
+from .models import FeedEntry, Follow, Post, UserStats
+
+
+def is_prolific(author_id):
+    """Авторов с большим числом постов не раскладываем по лентам."""
+    posts_count = UserStats.objects.filter(
+        user_id=author_id).values_list('posts_count', flat=True).first()
+    if posts_count is None:
+        posts_count = Post.objects.filter(author_id=author_id).count()
+    return posts_count >= settings.FEED_PULL_THRESHOLD
+
+
+def fan_out(post):
+    if is_prolific(post.author_id):
+        Follow.objects.filter(
+            author_id=post.author_id, pull=False).update(pull=True)
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id, pull=False).values_list('user', flat=True)
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, post=post, author_id=post.author_id,
+                      pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+@task(queue='feeds', unique=True)
+def demote(author_id):
+    """
+    Автор, переставший быть плодовитым, снова раскладывается по лентам:
+    подписчикам, читавшим его посты напрямую, достраиваются записи.
+    Задача, а не сигнал: при удалении автора его посты и подписки
+    удаляются в той же транзакции, и достраивать нечего.
+    """
+    if is_prolific(author_id):
+        return
+    for follow in Follow.objects.filter(author_id=author_id, pull=True):
+        backfill(follow)
+        Follow.objects.filter(pk=follow.pk).update(pull=False)
+
+
+def backfill(follow):
+    posts = Post.objects.filter(
+        author_id=follow.author_id).values_list('id', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=follow.user_id, post_id=post_id,
+                      author_id=follow.author_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+        ],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def trim(follow):
+    FeedEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id).delete()
+
+
+class MergedFeed:
+    """
+    Несколько запросов с общим ключом (pub_date, post_id), которые
+    KeysetPaginator листает как один. Каждый запрос читает свой индекс
+    от курсора, а страница собирается слиянием строк по ключу.
+    """
+
+    def __init__(self, *parts, ordering=('-pub_date', '-post_id')):
+        self.parts = parts
+        self.ordering = ordering
+
+    def filter(self, *args, **kwargs):
+        return MergedFeed(
+            *(part.filter(*args, **kwargs) for part in self.parts),
+            ordering=self.ordering)
+
+    def order_by(self, *fields):
+        return MergedFeed(*self.parts, ordering=fields)
+
+    def count(self):
+        return sum(part.count() for part in self.parts)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('MergedFeed supports only slices')
+        parts = [part.order_by(*self.ordering) for part in self.parts]
+        if index.stop is not None:
+            parts = [part[:index.stop] for part in parts]
+        rows = heapq.merge(
+            *parts,
+            key=attrgetter(*(field.lstrip('-') for field in self.ordering)),
+            reverse=self.ordering[0].startswith('-'),
+        )
+        return list(islice(rows, index.start, index.stop))
+
+
+def following_feed(user, stubs=False):
+    """
+    Возвращает (ленту, параметры пагинатора) для ленты подписок; со
+    stubs=True страница состоит из лёгких строк, как у posts_stubs.
+    Обычно это один проход по индексу ленты пользователя; посты
+    плодовитых авторов читаются по индексу постов автора и сливаются
+    с лентой по тому же ключу.
+    """
+    options = {'keys': ('pub_date', 'post_id'),
+               'loader': posts_loader(user, stubs=stubs)}
+    entries = FeedEntry.objects.filter(user=user)
+    pulled = list(
+        user.follower.filter(pull=True).values_list('author', flat=True))
+    if not pulled:
+        return entries, options
+    # Записи, разложенные до того, как автор стал плодовитым, читаются
+    # из постов, чтобы не попасть на страницу дважды.
+    posts = Post.objects.filter(author__in=pulled).annotate(
+        post_id=F('id')).only('id', 'pub_date')
+    return MergedFeed(entries.exclude(author__in=pulled), posts), options
@@ -0,0 +1,98 @@
+import math
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from .models import Post, TrendingPost
+from .utils import EPOCH
+
+
+def decay_time():
+    """Постоянная затухания τ в секундах."""
+    return settings.TRENDING_HALF_LIFE / math.log(2)
+
+
+def event_score(weight, when):
+    """
+    Логарифм веса события, отнесённого к общей точке отсчёта. Вместо
+    того чтобы уменьшать старые вклады, растут новые: вклад события
+    пропорционален exp(t / τ), а сравнивать посты можно, не трогая
+    их оценки. В линейной шкале такие числа переполнили бы float.
+    """
+    if weight <= 0:
+        raise ImproperlyConfigured(
+            'TRENDING_LIKE_WEIGHT и TRENDING_COMMENT_WEIGHT '
+            'должны быть положительными.')
+    return math.log(weight) + (when - EPOCH).total_seconds() / decay_time()
+
+
+def log_add(a, b):
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def log_sub(a, b):
+    """log(e^a - e^b); None, если от оценки ничего не осталось."""
+    if a is None or b >= a:
+        return None
+    remainder = -math.expm1(b - a)
+    if remainder < 1e-9:
+        return None
+    return a + math.log(remainder)
+
+
+def _update(post_id, combine):
+    # Оптимистичное обновление: если оценку успели поменять, перечитываем.
+    posts = Post.objects.filter(pk=post_id)
+    while True:
+        scores = list(posts.values_list('trending_score', flat=True))
+        if not scores:
+            return
+        if posts.filter(trending_score=scores[0]).update(
+                trending_score=combine(scores[0])):
+            return
+
+
+def add_event(post_id, weight, when):
+    score = event_score(weight, when)
+    _update(post_id, lambda current: log_add(current, score))
+
+
+def remove_event(post_id, weight, when):
+    score = event_score(weight, when)
+    _update(post_id, lambda current: log_sub(current, score))
+
+
+def rebuild_scores(post_model, like_model, comment_model):
+    """Пересчитывает оценки всех постов по лайкам и комментариям."""
+    scores = {}
+    for model, weight in ((like_model, settings.TRENDING_LIKE_WEIGHT),
+                          (comment_model, settings.TRENDING_COMMENT_WEIGHT)):
+        for post_id, created in model.objects.values_list(
+                'post_id', 'created').iterator():
+            scores[post_id] = log_add(
+                scores.get(post_id), event_score(weight, created))
+    with transaction.atomic():
+        post_model.objects.update(trending_score=None)
+        for post_id, score in scores.items():
+            post_model.objects.filter(pk=post_id).update(
+                trending_score=score)
+    return len(scores)
+
+
+def refresh():
+    """Перекладывает TRENDING_SIZE лучших постов в таблицу страницы."""
+    top = Post.objects.filter(trending_score__isnull=False).order_by(
+        '-trending_score', '-id').values_list('id', flat=True)
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            TrendingPost(post_id=post_id, rank=rank)
+            for rank, post_id in enumerate(top[:settings.TRENDING_SIZE]))
+
+
+def trending_ids():
+    return list(TrendingPost.objects.values_list('post_id', flat=True))
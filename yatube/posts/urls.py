@@ -5,6 +5,7 @@ from . import views
 app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending_index, name='trending'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('profile/<str:username>/edit',
          views.profile_edit, name='profile_edit'),
@@ -24,6 +25,7 @@ urlpatterns = [
     path('posts/<int:post_id>/delete/', views.post_delete, name='post_delete'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/search/', views.post_search, name='post_search'),
+    path('suggest/', views.suggest, name='suggest'),
     path('groups/', views.groups_list, name='groups_list'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
     path('group/<slug:slug>/follow/', views.group_follow, name='group_follow'),
@@ -44,6 +46,7 @@ urlpatterns = [
     path('group-create/', views.group_create, name='group_create'),
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('notifications/', views.notifications_list, name='notifications'),
     path('groups-follow/',
          views.group_follow_index, name='group_follow_index'),
     path(
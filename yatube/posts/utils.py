@@ -1,10 +1,9 @@
+import base64
 import datetime
-import os
-import IP2Location
 
-from django.shortcuts import render
 from django.core.paginator import Paginator
 from django.conf import settings
+from django.db.models import Q
 
 
 TZ_OFFSET_TO_NAME = {
@@ -38,10 +37,127 @@ TZ_OFFSET_TO_NAME = {
 }
 
 
-def paginator_func(request, post):
-    paginator = Paginator(post, settings.POSTS_VIEW_NUM)
+CURSOR_FORWARD = 'n'
+CURSOR_BACKWARD = 'p'
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def encode_cursor(direction, pub_date, pk):
+    delta = pub_date - EPOCH
+    micro = (delta.days * 86400 + delta.seconds) * 10**6 + delta.microseconds
+    raw = f'{direction}.{micro}.{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (направление, pub_date, id) или бросает ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, micro, post_id = raw.decode().split('.')
+        pub_date = EPOCH + datetime.timedelta(microseconds=int(micro))
+        post_id = int(post_id)
+    except (TypeError, ValueError, UnicodeDecodeError, OverflowError):
+        raise ValueError('Invalid cursor')
+    if direction not in (CURSOR_FORWARD, CURSOR_BACKWARD):
+        raise ValueError('Invalid cursor')
+    return direction, pub_date, post_id
+
+
+class KeysetPaginator(Paginator):
+    """
+    Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET:
+    любая страница стоит столько же, сколько первая.
+
+    Возвращает обычный Page с атрибутами next_cursor и previous_cursor;
+    number и num_pages описывают только соседние страницы, поэтому
+    has_next()/has_previous() работают без подсчёта всех записей.
+
+    keys задаёт поля ключа в object_list, а loader превращает строки
+    страницы в посты, если листается не сама таблица постов.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 loader=None):
+        super().__init__(object_list, per_page)
+        self.date_key, self.id_key = keys
+        self.loader = loader
+
+    def get_page(self, cursor):
+        try:
+            direction, pub_date, pk = decode_cursor(cursor)
+        except ValueError:
+            return self._first_page()
+        if direction == CURSOR_BACKWARD:
+            rows = list(self.object_list.filter(
+                self._seek('gt', pub_date, pk)
+            ).order_by(self.date_key, self.id_key)[:self.per_page + 1])
+            if len(rows) <= self.per_page:
+                return self._first_page()
+            rows = rows[self.per_page - 1::-1]
+            return self._make_page(
+                rows,
+                next_cursor=self._cursor(CURSOR_FORWARD, rows[-1]),
+                previous_cursor=self._cursor(CURSOR_BACKWARD, rows[0]),
+            )
+        rows = list(self.object_list.filter(
+            self._seek('lt', pub_date, pk)
+        ).order_by(
+            '-' + self.date_key, '-' + self.id_key)[:self.per_page + 1])
+        return self._build_page(rows, has_previous=True)
+
+    def _seek(self, lookup, pub_date, pk):
+        return Q(**{f'{self.date_key}__{lookup}': pub_date}) | Q(**{
+            self.date_key: pub_date, f'{self.id_key}__{lookup}': pk})
+
+    def _cursor(self, direction, row):
+        return encode_cursor(
+            direction, getattr(row, self.date_key), getattr(row, self.id_key))
+
+    def _first_page(self):
+        rows = list(self.object_list.order_by(
+            '-' + self.date_key, '-' + self.id_key)[:self.per_page + 1])
+        return self._build_page(rows, has_previous=False)
+
+    def _build_page(self, rows, has_previous):
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = previous_cursor = None
+        if has_next:
+            next_cursor = self._cursor(CURSOR_FORWARD, rows[-1])
+        if has_previous and rows:
+            previous_cursor = self._cursor(CURSOR_BACKWARD, rows[0])
+        return self._make_page(rows, next_cursor, previous_cursor)
+
+    def _make_page(self, rows, next_cursor, previous_cursor):
+        number = 1 if previous_cursor is None else 2
+        self.num_pages = number if next_cursor is None else number + 1
+        if self.loader is not None:
+            rows = self.loader(rows)
+        page = self._get_page(rows, number, self)
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        return page
+
+
+def paginator_func(request, post, keys=('pub_date', 'id'), loader=None):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if page_number is not None:
+        # Старые ссылки вида ?page=N продолжают работать через OFFSET.
+        paginator = Paginator(post, settings.POSTS_VIEW_NUM)
+        page_obj = paginator.get_page(page_number)
+        if loader is not None:
+            page_obj.object_list = loader(list(page_obj.object_list))
+        return page_obj
+    paginator = KeysetPaginator(post, settings.POSTS_VIEW_NUM, keys, loader)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def ranked_paginator_func(request, ids, loader):
+    """Страница по заранее упорядоченному списку id (по релевантности)."""
+    paginator = Paginator(ids, settings.POSTS_VIEW_NUM)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = loader(page_obj.object_list)
     return page_obj
 
 
@@ -71,22 +187,3 @@ def get_client_ip(request):
     else:
         ip = request.META.get('REMOTE_ADDR')
     return ip
-
-
-def ip_timezone_cookie(request, template, context):
-    database = IP2Location.IP2Location(os.path.join(
-        settings.BASE_DIR, "ip_db", "IP2LOCATION-LITE-DB11.IPV6.BIN"))
-    try:
-        ip = get_client_ip(request)
-        offset = database.get_timezone(ip)
-    except Exception:
-        offset = '+00:00'
-    try:
-        timezone = TZ_OFFSET_TO_NAME[offset]
-    except Exception:
-        timezone = 'Etc/GMT'
-    context['timezone'] = timezone
-    response = render(request, template, context)
-    set_cookie(response, 'timezone', timezone)
-    set_cookie(response, 'ip', ip)
-    return response
@@ -2,45 +2,72 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-
-from .forms import PostForm, CommentForm, ProfileForm, GroupForm
-from .models import Post, Group, User, Follow, Like, Comment, Membership
-from .utils import paginator_func, ip_timezone_cookie, get_client_ip
-
-
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+
+from core.replicas import replica_reads
+from core.surrogate import surrogate_key
+
+from . import autocomplete, notifications, search, trending
+from .cards import card_surrogate_keys
+from .conditional import (FEEDS_KEY, GROUPS_KEY, page_parts,
+                          render_conditional, stats_parts)
+from .feeds import load_page, posts_feed, posts_loader, posts_stubs
+from .forms import (PostForm, CommentForm, ProfileForm, GroupForm,
+                    TimezoneForm)
+from .models import (Post, Group, User, Follow, Like, Comment, Membership,
+                     Profile)
+from .stats import get_user_stats
+from .timeline import following_feed
+from .utils import paginator_func, ranked_paginator_func
+
+
+@replica_reads
 def index(request):
-    post_list = Post.objects.all()
+    post_list = posts_feed(request.user)
     page_obj = paginator_func(request, post_list)
     context = {
         'page_obj': page_obj,
     }
-    if (request.COOKIES.get('timezone')
-       and request.COOKIES.get('ip') == get_client_ip(request)):
-        return render(request, 'posts/index.html', context)
-    else:
-        return ip_timezone_cookie(request, 'posts/index.html', context)
+    return render(request, 'posts/index.html', context)
+
+
+@replica_reads
+def trending_index(request):
+    page_obj = ranked_paginator_func(
+        request, trending.trending_ids(), posts_loader(request.user, key=int))
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/trending.html', context)
 
 
+@replica_reads
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = posts_stubs(request.user, group=group)
     page_obj = paginator_func(request, post_list)
-    memberships = Membership.objects.filter(group=group)
-    administrators_count = memberships.filter(role='a').count()
-    members_count = memberships.count()
-    if (request.user.is_authenticated
-       and memberships.filter(member=request.user).exists()):
-        membership = memberships.get(member=request.user)
-    else:
+
+    def context():
+        load_page(page_obj, request.user)
+        memberships = Membership.objects.filter(group=group)
         membership = None
-    context = {
-        'group': group,
-        'page_obj': page_obj,
-        'membership': membership,
-        'administrators_count': administrators_count,
-        'members_count': members_count,
-    }
-    return render(request, 'posts/group_posts.html', context)
+        if request.user.is_authenticated:
+            membership = memberships.filter(member=request.user).first()
+        return {
+            'group': group,
+            'page_obj': page_obj,
+            'membership': membership,
+            'administrators_count': memberships.filter(role='a').count(),
+            'members_count': memberships.count(),
+        }
+    return render_conditional(
+        request, 'posts/group_posts.html', context,
+        keys=[surrogate_key('group', group.pk)] + [
+            key for post in page_obj for key in card_surrogate_keys(post)],
+        parts=page_parts(page_obj),
+        since=(FEEDS_KEY,),
+    )
 
 
 @login_required
@@ -53,7 +80,7 @@ def group_create(request):
     group = form.save(commit=False)
     group.save()
     group = Group.objects.get(slug=group.slug)
-    group.members.add(request.user, through_defaults={'role': 'a'})
+    Membership.objects.create(group=group, member=request.user, role='a')
     return redirect('posts:group_posts', slug=group.slug)
 
 
@@ -169,17 +196,18 @@ def group_demote_administrator(request, slug):
 
 
 def groups_list(request):
-    context = {
-        'groups': Group.objects.all().order_by('title'),
-    }
-    return render(request, 'posts/groups_list.html', context)
+    return render_conditional(
+        request, 'posts/groups_list.html',
+        lambda: {'groups': Group.objects.all().order_by('title')},
+        keys=(GROUPS_KEY,),
+    )
 
 
+@replica_reads
 @login_required
 def group_follow_index(request):
-    groups = Group.objects.filter(
-        members=request.user).values_list('slug', flat=True)
-    post_list = Post.objects.filter(group__slug__in=groups)
+    groups = Group.objects.filter(members=request.user)
+    post_list = posts_feed(request.user, group__in=groups)
     page_obj = paginator_func(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -187,22 +215,35 @@ def group_follow_index(request):
     return render(request, 'posts/group_follow_index.html', context)
 
 
+@replica_reads
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    groups_count = Group.objects.filter(members=user).count()
-    user_posts = user.posts.all()
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    user_posts = posts_stubs(request.user, author=user)
     page_obj = paginator_func(request, user_posts)
-    following = False
+    stats = get_user_stats(user)
+    keys = [surrogate_key('user', user.pk)] + [
+        key for post in page_obj for key in card_surrogate_keys(post)]
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=user).exists()
-    context = {
-        'author': user,
-        'page_obj': page_obj,
-        'following': following,
-        'groups_count': groups_count,
-    }
-    return render(request, 'posts/profile.html', context)
+        keys.append(surrogate_key('follows', request.user.pk))
+
+    def context():
+        load_page(page_obj, request.user)
+        following = False
+        if request.user.is_authenticated:
+            following = Follow.objects.filter(
+                user=request.user, author=user).exists()
+        return {
+            'author': user,
+            'page_obj': page_obj,
+            'following': following,
+            'stats': stats,
+        }
+    return render_conditional(
+        request, 'posts/profile.html', context, keys,
+        parts=(page_parts(page_obj), stats_parts(stats)),
+        since=(FEEDS_KEY,),
+    )
 
 
 def profile_group_list(request, username):
@@ -216,21 +257,36 @@ def profile_group_list(request, username):
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    likes = post.likes.order_by('-created')[:settings.LIKES_VIEW_NUM]
-    liked = False
-    if request.user.is_authenticated:
-        liked = Like.objects.filter(
-            post=post, user=request.user).exists()
-    context = {
-        'post': post,
-        'form': CommentForm(request.POST),
-        'comments': post.comments.all(),
-        'liked': liked,
-        'likes': likes,
-        'likes_num': settings.LIKES_VIEW_NUM,
-    }
-    return render(request, 'posts/post_detail.html', context)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
+    author_stats = get_user_stats(post.author)
+
+    def context():
+        # Лайки и комментарии меняют версию поста, так что этих запросов
+        # не будет, если у клиента актуальная копия.
+        liked = False
+        if request.user.is_authenticated:
+            liked = Like.objects.filter(
+                post=post, user=request.user).exists()
+        return {
+            'post': post,
+            'form': CommentForm(request.POST),
+            'comments': post.comments.all(),
+            'liked': liked,
+            'likes': post.likes.order_by('-created')[:settings.LIKES_VIEW_NUM],
+            'likes_num': settings.LIKES_VIEW_NUM,
+            'author_stats': author_stats,
+        }
+    # Имена комментаторов и последних лайкнувших тоже на странице.
+    users = set(post.comments.values_list('author_id', flat=True)) | set(
+        post.likes.order_by('-created').values_list(
+            'user_id', flat=True)[:settings.LIKES_VIEW_NUM])
+    return render_conditional(
+        request, 'posts/post_detail.html', context,
+        keys=card_surrogate_keys(post) + [
+            surrogate_key('user', user_id) for user_id in users],
+        parts=(post.thumbnails_ready, stats_parts(author_stats)),
+    )
 
 
 @login_required
@@ -264,7 +320,12 @@ def post_edit(request, post_id):
     }
     if not form.is_valid():
         return render(request, 'posts/create_post.html', context)
-    form.save()
+    # Счётчики и оценку могли сдвинуть, пока шла правка: записываются
+    # только поля формы, а с новой картинкой — и её размеры.
+    fields = list(PostForm._meta.fields)
+    if 'image' in form.changed_data:
+        fields += ['image_width', 'image_height', 'thumbnails_ready']
+    form.save(commit=False).save(update_fields=fields)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -278,13 +339,20 @@ def post_delete(request, post_id):
     return redirect('posts:profile', username=request.user)
 
 
+@replica_reads
 @require_http_methods(["GET"])
 def post_search(request):
     search_text = request.GET.get('search_text')
     if search_text is None:
         return redirect('posts:index')
-    post_list = Post.objects.filter(text__icontains=search_text)
-    page_obj = paginator_func(request, post_list)
+    page_obj = ranked_paginator_func(
+        request,
+        search.search_ids(search_text),
+        posts_loader(request.user, key=int),
+    )
+    found = search.snippets(page_obj.object_list, search_text)
+    for post in page_obj:
+        post.snippet = found[post.id]
     context = {
         'page_obj': page_obj,
         'search_text': search_text
@@ -292,6 +360,11 @@ def post_search(request):
     return render(request, 'posts/post_search.html', context)
 
 
+def suggest(request):
+    return JsonResponse(
+        {'results': autocomplete.suggest(request.GET.get('q', ''))})
+
+
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -304,17 +377,31 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
 @login_required
 def follow_index(request):
-    authors = request.user.follower.values_list('author', flat=True)
-    post_list = Post.objects.filter(author__id__in=authors)
-    page_obj = paginator_func(request, post_list)
+    post_list, options = following_feed(request.user)
+    page_obj = paginator_func(request, post_list, **options)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@login_required
+def notifications_list(request):
+    page_obj = paginator_func(
+        request, notifications.recent(request.user), keys=('updated', 'id'))
+    # Страница уже выбрана, отметки «новое» на ней остаются до следующего
+    # показа.
+    page_obj.object_list = list(page_obj.object_list)
+    notifications.mark_read(request.user)
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/notifications.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     user = get_object_or_404(User, username=username)
@@ -333,21 +420,35 @@ def profile_unfollow(request, username):
     return redirect('posts:profile', username=username)
 
 
+def like_response(request, post_id, liked):
+    if not request.is_ajax():
+        return redirect('posts:post_detail', post_id=post_id)
+    return JsonResponse({
+        'liked': liked,
+        'likes_count': get_object_or_404(
+            Post.objects.values_list('likes_count', flat=True), pk=post_id),
+    })
+
+
 @login_required
+@require_http_methods(["POST"])
 def post_like(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    Like.objects.get_or_create(
-        post=post,
-        user=request.user,
-    )
-    return redirect('posts:post_detail', post_id=post_id)
+    post = get_object_or_404(Post.objects.only('id', 'author'), id=post_id)
+    # Один INSERT: повторный лайк упирается в ограничение уникальности,
+    # и счётчик с уведомлением не срабатывают второй раз.
+    try:
+        with transaction.atomic():
+            Like.objects.create(post=post, user=request.user)
+    except IntegrityError:
+        pass
+    return like_response(request, post_id, True)
 
 
 @login_required
+@require_http_methods(["POST"])
 def post_dislike(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    Like.objects.filter(post=post, user=request.user).delete()
-    return redirect('posts:post_detail', post_id=post_id)
+    Like.objects.filter(post_id=post_id, user=request.user).delete()
+    return like_response(request, post_id, False)
 
 
 def post_likes(request, post_id):
@@ -388,12 +489,18 @@ def profile_edit(request, username):
         request.POST or None,
         instance=user,
     )
+    timezone_form = TimezoneForm(
+        request.POST or None,
+        instance=Profile.objects.get_or_create(user=user)[0],
+    )
     context = {
         'form': form,
+        'timezone_form': timezone_form,
     }
-    if not form.is_valid():
+    if not (form.is_valid() and timezone_form.is_valid()):
         return render(request, 'posts/profile_edit.html', context)
     user.save()
+    timezone_form.save()
     return redirect('posts:profile', username=username)
 
 
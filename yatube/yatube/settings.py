@@ -49,16 +49,19 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.middleware.TimezoneMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -79,6 +82,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.notifications.notifications',
             ],
         },
     },
@@ -92,9 +96,25 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Копия основной базы, которую обновляет manage.py sync_replicas, а
+    # в тестах — copy_database. У неё своя тестовая база, а не зеркало
+    # основной: иначе отставание реплики не воспроизвести.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+    },
 }
 
+# Реплики только для чтения — псевдонимы из DATABASES. С них читают
+# ленты, профили и поиск. Для проверки на своей машине добавьте сюда
+# 'replica'.
+REPLICA_DATABASES = []
+# Сколько секунд после своей записи пользователь читает основную базу
+REPLICA_STICKY_SECONDS = 10
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,7 +158,15 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Письма ставятся в очередь задач, воркер отправляет их через
+# EMAIL_DELIVERY_BACKEND; для локальной работы подойдёт
+# 'django.core.mail.backends.filebased.EmailBackend' с EMAIL_FILE_PATH
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+EMAIL_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+EMAIL_CONNECTION_IDLE = 60
+# Сколько писем из очереди отправляется за одно выполнение задачи
+EMAIL_BATCH_SIZE = 50
 EMAIL_HOST = 'smtp.yandex.ru'
 EMAIL_USE_SSL = True
 EMAIL_USE_TLS = False
@@ -151,20 +179,89 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 # Paginator
 POSTS_VIEW_NUM = 10
 
+# Лента подписок: посты авторов, у которых постов не меньше порога,
+# не раскладываются по лентам подписчиков, а читаются напрямую
+FEED_PULL_THRESHOLD = 500
+FEED_BATCH_SIZE = 500
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 # Media path
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш общий для всех процессов сайта и воркера задач: файл SQLite в
+# режиме WAL, вытеснение давно не читанных записей при превышении
+# MAX_ENTRIES или MAX_SIZE байт
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
+# manage.py test держит кэш во временном каталоге
+TEST_RUNNER = 'core.runner.TestRunner'
+
+# Отрисованные карточки постов; устаревают по версиям, а не по времени
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько лучших совпадений поиска листается по страницам
+SEARCH_MAX_RESULTS = 1000
+# Длина фрагмента с подсветкой в словах и время его жизни в кэше
+SEARCH_SNIPPET_WORDS = 30
+SEARCH_SNIPPET_CACHE_TIMEOUT = 60 * 60
+
+# Сколько подсказок отдаёт автодополнение
+AUTOCOMPLETE_LIMIT = 10
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
 LIKES_VIEW_NUM = 6
+
+# Популярное: вес лайка и комментария, период полураспада веса в
+# секундах и длина списка, который собирает manage.py refresh_trending
+TRENDING_LIKE_WEIGHT = 1
+TRENDING_COMMENT_WEIGHT = 3
+TRENDING_HALF_LIFE = 60 * 60 * 12
+TRENDING_SIZE = 100
+
+# Постов на странице JSON API
+API_PAGE_SIZE = 20
+
+# Миниатюры картинок постов создаются в фоне задачами очереди.
+# Каждый размер создаётся в каждом формате; последний формат — для <img>
+THUMBNAIL_SIZES = (360, 720, 1080)
+THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+THUMBNAIL_DISPLAY_SIZE = 720
+
+# Очередь фоновых задач (manage.py run_tasks). TASKS_EAGER выполняет
+# задачи сразу при постановке, без воркера
+TASKS_EAGER = False
+TASK_WORKERS = 2
+TASK_POLL_INTERVAL = 1
+TASK_LEASE = 60 * 10
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_RETRY_MAX_DELAY = 60 * 60
+# Выполненные задачи хранятся сутки и удаляются воркером раз в час
+TASK_KEEP_DONE = 60 * 60 * 24
+TASK_PRUNE_INTERVAL = 60 * 60
+
+# События для уведомлений сворачиваются в сводки не сразу, а спустя
+# NOTIFICATION_DELAY секунд, пачками по NOTIFICATION_BATCH_SIZE
+NOTIFICATION_DELAY = 30
+NOTIFICATION_BATCH_SIZE = 500
+
+# Определение часового пояса по IP
+IP2LOCATION_DB = os.path.join(
+    BASE_DIR, 'ip_db', 'IP2LOCATION-LITE-DB11.IPV6.BIN')
+IP_TIMEZONE_CACHE_SIZE = 10000
+# Индекс диапазонов, собранный командой build_ip_index
+IP_INDEX_DIR = os.path.join(BASE_DIR, 'ip_db', 'tz_index')
@@ -8,6 +8,7 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/', include('api.urls', namespace='api')),
     path('', include('posts.urls', namespace='posts'))
 ]
 handler404 = 'core.views.page_not_found'